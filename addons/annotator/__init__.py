@@ -23,7 +23,11 @@ bl_info = {
     "category": "Add Mesh"
 }
 
+import time
+_import_start = time.perf_counter()
+
 import bpy
+import os
 import re
 
 from bpy.props import (StringProperty,
@@ -39,6 +43,84 @@ from bpy.types import (Panel,
                        Operator,
                        PropertyGroup,
                        )
+from bpy.app.handlers import persistent
+from bpy_extras.io_utils import ExportHelper, ImportHelper
+
+try:
+    from bony import instrument
+except ImportError:
+    instrument = None
+
+STARTUP_TIMES = {}
+
+
+# ------------------------------------------------------------------------
+#   Cached lookups
+#   Poll runs on every redraw of pie menus, so avoid asking the tool system each time
+# ------------------------------------------------------------------------
+
+# (workspace pointer, mode) -> whether an annotate tool is active
+_tool_state = {}
+# (grease pencil pointer, layer name) -> layer index
+_layer_index = {}
+_msgbus_owner = object()
+
+
+ANNOTATOR_LAYER_PATTERN = re.compile(r"^_([A-Z]+)_annotator$")
+
+
+def annotator_layers(gp):
+    """Layers created by SelectAnnotationLayer"""
+    return [l for l in gp.layers if ANNOTATOR_LAYER_PATTERN.match(l.info)]
+
+
+def invalidate_tool_state(*args):
+    _tool_state.clear()
+
+
+def is_annotate_tool_active(context):
+    key = (context.workspace.as_pointer(), context.mode)
+    active = _tool_state.get(key)
+    if active is None:
+        tool = context.workspace.tools.from_space_view3d_mode(context.mode, create=False)
+        active = tool is not None and "annotate" in tool.idname
+        _tool_state[key] = active
+    return active
+
+
+def find_annotation_layer(gp, layer_name):
+    key = (gp.as_pointer(), layer_name)
+    i = _layer_index.get(key)
+    # Layer names are unique, so a matching name at the cached index means it's still valid
+    if i is not None and i < len(gp.layers) and gp.layers[i].info == layer_name:
+        return gp.layers[i]
+
+    # Layers were added, removed or renamed: rebuild the index of this datablock
+    ptr = gp.as_pointer()
+    for k in [k for k in _layer_index if k[0] == ptr]:
+        del _layer_index[k]
+    found = None
+    for i, l in enumerate(gp.layers):
+        _layer_index[(ptr, l.info)] = i
+        if l.info == layer_name:
+            found = l
+    return found
+
+
+def subscribe_tool_changes():
+    bpy.msgbus.clear_by_owner(_msgbus_owner)
+    bpy.msgbus.subscribe_rna(key=(bpy.types.WorkSpace, "tools"), owner=_msgbus_owner,
+                             args=(), notify=invalidate_tool_state)
+    bpy.msgbus.subscribe_rna(key=(bpy.types.Object, "mode"), owner=_msgbus_owner,
+                             args=(), notify=invalidate_tool_state)
+
+
+@persistent
+def on_load_post(*args):
+    # Message bus subscriptions don't survive loading a file
+    invalidate_tool_state()
+    _layer_index.clear()
+    subscribe_tool_changes()
 
 
 class SelectAnnotationLayer(bpy.types.Operator):
@@ -70,19 +152,19 @@ class SelectAnnotationLayer(bpy.types.Operator):
 
     @classmethod
     def poll(cls, context):
-        tool = bpy.context.workspace.tools.from_space_view3d_mode(bpy.context.mode, create=False).idname
-        return "annotate" in tool
+        return is_annotate_tool_active(context)
 
 
     def execute(self, context):
         gp = bpy.context.scene.grease_pencil
         layer_name = f"_{self.layer_color}_annotator"
-        gpl = next((l for l in gp.layers if l.info == layer_name), None)
+        gpl = find_annotation_layer(gp, layer_name) if gp else None
         if gpl:
             gp.layers.active = gpl
         else:
             bpy.ops.gpencil.layer_annotation_add()
-            gpl = gp.layers.active 
+            gp = bpy.context.scene.grease_pencil
+            gpl = gp.layers.active
             gpl.info = layer_name
             gpl.color = self.COLOR_SET[self.layer_color]
             
@@ -96,29 +178,206 @@ class RemoveAnnotation(bpy.types.Operator):
     bl_options = {'REGISTER', 'UNDO'}
 
     remove_all: bpy.props.BoolProperty(name="remove all", default=False)
+    scope: bpy.props.EnumProperty(
+            items = [('ACTIVE', 'Active Layer', 'Remove the active layer'),
+                     ('ALL', 'All Layers', 'Remove every annotation layer'),
+                     ('ANNOTATOR', 'Annotator Layers', 'Remove only the colour layers made by Annotator'),
+                     ('BEFORE_FRAME', 'Before Frame', 'Remove annotation frames older than a given frame')],
+            name = "Scope",
+            default = 'ACTIVE')
+    before_frame: bpy.props.IntProperty(name="Before Frame", default=0)
+    purge: bpy.props.BoolProperty(
+            name="Purge Data",
+            description="Delete the annotation datablock if nothing is left in it",
+            default=False)
 
     @classmethod
     def poll(cls, context):
-        tool = bpy.context.workspace.tools.from_space_view3d_mode(bpy.context.mode, create=False).idname
-        return "annotate" in tool
+        return is_annotate_tool_active(context)
 
 
     def execute(self, context):
-        if self.remove_all:
-            gp = bpy.context.scene.grease_pencil
-            while len(gp.layers) > 0:
-                bpy.ops.gpencil.layer_annotation_remove()
-        else:
+        scene = bpy.context.scene
+        gp = scene.grease_pencil
+        # Kept for pie menus bound to the old property
+        scope = 'ALL' if self.remove_all else self.scope
+
+        if scope == 'ACTIVE':
             bpy.ops.gpencil.layer_annotation_remove()
+            return {'FINISHED'}
+        if not gp:
+            return {'CANCELLED'}
+
+        # Edit the data directly: one pass and a single undo step for any number of layers
+        if scope == 'ALL':
+            layers = list(gp.layers)
+        elif scope == 'ANNOTATOR':
+            layers = annotator_layers(gp)
+        else:
+            layers = []
+            for l in gp.layers:
+                for f in [f for f in l.frames if f.frame_number < self.before_frame]:
+                    l.frames.remove(f)
+
+        for l in layers:
+            gp.layers.remove(l)
+
+        if self.purge and all(len(l.frames) == 0 for l in gp.layers):
+            scene.grease_pencil = None
+            if gp.users == 0:
+                bpy.data.grease_pencils.remove(gp)
+
+        return {'FINISHED'}
+
+
+# ------------------------------------------------------------------------
+#   Compact Annotations (see strokes.py)
+# ------------------------------------------------------------------------
+
+def find_region_3d(context):
+    if context.region_data:
+        return context.region, context.region_data
+    for area in context.screen.areas:
+        if area.type == 'VIEW_3D':
+            region = next(r for r in area.regions if r.type == 'WINDOW')
+            return region, area.spaces.active.region_3d
+    return None, None
+
+
+class CompactAnnotations(bpy.types.Operator):
+    bl_idname = "annotator.compact_layers"
+    bl_label = "Compact annotation layers"
+    bl_description = """Simplify and join strokes in Annotator's colour layers and drop empty frames"""
+    bl_options = {'REGISTER', 'UNDO'}
+
+    tolerance: bpy.props.FloatProperty(
+            name="Tolerance",
+            description="Maximum deviation from the original strokes, in pixels of the current view",
+            default=1.5, min=0.0, subtype='PIXEL')
+    min_extent: bpy.props.FloatProperty(
+            name="Minimum Size",
+            description="Remove strokes smaller than this, in pixels of the current view",
+            default=2.0, min=0.0, subtype='PIXEL')
+    min_points: bpy.props.IntProperty(
+            name="Minimum Points",
+            description="Remove strokes with fewer points than this",
+            default=2, min=1)
+
+    @classmethod
+    def poll(cls, context):
+        return bpy.context.scene.grease_pencil is not None
+
+
+    def execute(self, context):
+        from .strokes import project_to_region, compact_frame
+
+        region, rv3d = find_region_3d(context)
+        if rv3d is None:
+            self.report({'ERROR'}, "Need a 3D view to measure the tolerance in")
+            return {'CANCELLED'}
+
+        matrix = rv3d.perspective_matrix.copy()
+        project = lambda co: project_to_region(co, matrix, region.width, region.height)
+
+        gp = bpy.context.scene.grease_pencil
+        before, after, dropped, empty_frames = 0, 0, 0, 0
+        for layer in annotator_layers(gp):
+            for frame in list(layer.frames):
+                b, a, d = compact_frame(frame, project, self.tolerance, self.min_extent, self.min_points)
+                before += b
+                after += a
+                dropped += d
+                if len(frame.strokes) == 0:
+                    layer.frames.remove(frame)
+                    empty_frames += 1
+
+        self.report({'INFO'}, f"Points: {before} -> {after}, removed {dropped} tiny stroke(s) "
+                                  f"and {empty_frames} empty frame(s)")
+        return {'FINISHED'}
+
+
+# ------------------------------------------------------------------------
+#   Export / Import (see strokes.py)
+# ------------------------------------------------------------------------
+
+class ExportAnnotations(bpy.types.Operator, ExportHelper):
+    bl_idname = "annotator.export_layers"
+    bl_label = "Export annotations"
+    bl_description = """Export annotation layers to a JSON lines file"""
+    bl_options = {'REGISTER'}
+
+    filename_ext = ".jsonl"
+    filter_glob: bpy.props.StringProperty(default="*.jsonl", options={'HIDDEN'})
+    annotator_only: bpy.props.BoolProperty(name="Annotator layers only", default=True)
 
+    @classmethod
+    def poll(cls, context):
+        return bpy.context.scene.grease_pencil is not None
+
+
+    def execute(self, context):
+        from .strokes import export_annotations
+        export_annotations(bpy.context.scene.grease_pencil, self.filepath, self.annotator_only)
+        return {'FINISHED'}
+
+
+class ImportAnnotations(bpy.types.Operator, ImportHelper):
+    bl_idname = "annotator.import_layers"
+    bl_label = "Import annotations"
+    bl_description = """Merge annotations from one or more exported files into this scene"""
+    bl_options = {'REGISTER', 'UNDO'}
+
+    filename_ext = ".jsonl"
+    filter_glob: bpy.props.StringProperty(default="*.jsonl", options={'HIDDEN'})
+    files: bpy.props.CollectionProperty(type=bpy.types.OperatorFileListElement, options={'HIDDEN'})
+    directory: bpy.props.StringProperty(subtype='DIR_PATH', options={'HIDDEN'})
+
+
+    def execute(self, context):
+        from .strokes import import_annotations
+        from .exchange import validate_records
+
+        paths = [os.path.join(self.directory, f.name) for f in self.files if f.name] or [self.filepath]
+        # Check every file before touching the scene, a bad record must not leave half an import behind
+        for path in paths:
+            try:
+                validate_records(path)
+            except (OSError, ValueError) as e:
+                self.report({'ERROR'}, str(e))
+                return {'CANCELLED'}
+
+        n_strokes = 0
+        for path in paths:
+            n_strokes += import_annotations(bpy.context.scene, path)
+
+        self.report({'INFO'}, f"Imported {n_strokes} stroke(s) from {len(paths)} file(s)")
         return {'FINISHED'}
 
 
 def register():
+    start = time.perf_counter()
+    if instrument:
+        instrument.instrument_operators([SelectAnnotationLayer, RemoveAnnotation, CompactAnnotations,
+                                         ExportAnnotations, ImportAnnotations])
     bpy.utils.register_class(SelectAnnotationLayer)
     bpy.utils.register_class(RemoveAnnotation)
+    bpy.utils.register_class(CompactAnnotations)
+    bpy.utils.register_class(ExportAnnotations)
+    bpy.utils.register_class(ImportAnnotations)
+    subscribe_tool_changes()
+    bpy.app.handlers.load_post.append(on_load_post)
+    STARTUP_TIMES["register"] = time.perf_counter() - start
 
 
 def unregister():
     bpy.utils.unregister_class(SelectAnnotationLayer)
     bpy.utils.unregister_class(RemoveAnnotation)
+    bpy.utils.unregister_class(CompactAnnotations)
+    bpy.utils.unregister_class(ExportAnnotations)
+    bpy.utils.unregister_class(ImportAnnotations)
+    bpy.msgbus.clear_by_owner(_msgbus_owner)
+    if on_load_post in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(on_load_post)
+
+
+STARTUP_TIMES["import"] = time.perf_counter() - _import_start
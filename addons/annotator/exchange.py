@@ -0,0 +1,133 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTIBILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Merge Annotator exports, e.g. the notes of several reviewers on one shot.
+
+    python annotator/exchange.py --output shot_notes.jsonl alice.jsonl bob.jsonl
+
+Needs neither Blender nor numpy. Import the result with Import annotations.
+"""
+
+import sys
+import json
+import argparse
+
+
+# JSON lines: a header, then layer, frame and stroke records in order,
+# so both directions stream one stroke at a time
+EXCHANGE_FORMAT = "annotator"
+EXCHANGE_VERSION = 1
+
+
+def header():
+    return {"type": "header", "format": EXCHANGE_FORMAT, "version": EXCHANGE_VERSION}
+
+
+def write_records(f, records):
+    for r in records:
+        f.write(json.dumps(r, separators=(",", ":")))
+        f.write("\n")
+
+
+def read_records(path):
+    with open(path) as f:
+        first = json.loads(f.readline())
+        if not isinstance(first, dict) or first.get("format") != EXCHANGE_FORMAT or first.get("version", 0) > EXCHANGE_VERSION:
+            raise ValueError(f"{path} isn't a supported Annotator export")
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _is_number_list(value, length=None):
+    return (isinstance(value, list) and (length is None or len(value) == length)
+            and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in value))
+
+
+def check_stroke(r):
+    if not _is_number_list(r.get("co")) or len(r["co"]) % 3:
+        return "co must be a flat list of x, y, z numbers"
+    n = len(r["co"]) // 3
+    for attr in ("pressure", "strength"):
+        if not _is_number_list(r.get(attr), n):
+            return f"{attr} must be a list of {n} numbers, one per point"
+    if not isinstance(r.get("display_mode", ""), str) or not isinstance(r.get("line_width", 0), int):
+        return "display_mode must be a string and line_width an integer"
+
+
+def check_record(r, parent):
+    """What's wrong with record r, None if it can be imported. parent is the type of the
+    last layer or frame record before it."""
+    if not isinstance(r, dict):
+        return "not a record"
+    kind = r.get("type")
+    if kind == "layer":
+        if not isinstance(r.get("info"), str) or not _is_number_list(r.get("color"), 3) \
+                or not isinstance(r.get("thickness"), int):
+            return "a layer needs info, an RGB color and an integer thickness"
+    elif kind == "frame":
+        if parent is None:
+            return "frame before any layer"
+        if not isinstance(r.get("frame_number"), int):
+            return "a frame needs an integer frame_number"
+    elif kind == "stroke":
+        if parent != "frame":
+            return "stroke before any frame"
+        return check_stroke(r)
+    else:
+        return f"unknown record type {kind!r}"
+
+
+def validate_records(path):
+    """Read the whole file and raise ValueError at the first record that can't be imported,
+    so an import never stops halfway. Returns the number of strokes."""
+    parent = None
+    n_strokes = 0
+    for i, r in enumerate(read_records(path), start=1):
+        problem = check_record(r, parent)
+        if problem:
+            raise ValueError(f"{path}, record {i}: {problem}")
+        if r["type"] == "stroke":
+            n_strokes += 1
+        else:
+            parent = r["type"]
+    return n_strokes
+
+
+def merge_exports(paths, out_path):
+    """Concatenate several exports into one without loading Blender data"""
+    for path in paths:
+        validate_records(path)
+    with open(out_path, "w") as out:
+        write_records(out, [header()])
+        for path in paths:
+            write_records(out, read_records(path))
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--output", required=True)
+    args = parser.parse_args(argv)
+
+    if args.output in args.files:
+        parser.error("--output must not be one of the files to merge")
+    try:
+        merge_exports(args.files, args.output)
+    except (OSError, ValueError) as e:
+        sys.exit(str(e))
+    print(f"Merged {len(args.files)} file(s) into {args.output}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,185 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTIBILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# Stroke data processing for Annotator's compaction and export/import
+
+import bpy
+import numpy as np
+
+from . import annotator_layers, find_annotation_layer
+from .exchange import header, write_records, read_records
+
+
+# ------------------------------------------------------------------------
+#   Compact Annotations
+# ------------------------------------------------------------------------
+
+STROKE_ATTRS = ("display_mode", "line_width")
+
+
+def read_stroke(stroke):
+    n = len(stroke.points)
+    co = np.empty(n * 3, dtype=np.float32)
+    pressure = np.empty(n, dtype=np.float32)
+    strength = np.empty(n, dtype=np.float32)
+    stroke.points.foreach_get("co", co)
+    stroke.points.foreach_get("pressure", pressure)
+    stroke.points.foreach_get("strength", strength)
+    return co.reshape(-1, 3), pressure, strength
+
+
+def write_stroke(frame, template, co, pressure, strength):
+    stroke = frame.strokes.new()
+    for attr in STROKE_ATTRS:
+        if template is not None and hasattr(template, attr):
+            setattr(stroke, attr, getattr(template, attr))
+    stroke.points.add(len(co))
+    stroke.points.foreach_set("co", co.ravel())
+    stroke.points.foreach_set("pressure", pressure)
+    stroke.points.foreach_set("strength", strength)
+    return stroke
+
+
+def project_to_region(co, perspective_matrix, width, height):
+    """World space points to region pixels"""
+    clip = np.c_[co, np.ones(len(co))] @ np.array(perspective_matrix).T
+    w = np.maximum(clip[:, 3], 1e-6)
+    return (clip[:, :2] / w[:, None] + 1) / 2 * (width, height)
+
+
+def simplify_mask(points, tolerance):
+    """Ramer-Douglas-Peucker on 2D points. Returns a mask of points to keep."""
+    n = len(points)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        a, b = stack.pop()
+        if b - a < 2:
+            continue
+        seg = points[b] - points[a]
+        rel = points[a + 1:b] - points[a]
+        seg_len = np.hypot(*seg)
+        if seg_len == 0:
+            d = np.hypot(rel[:, 0], rel[:, 1])
+        else:
+            d = np.abs(seg[0] * rel[:, 1] - seg[1] * rel[:, 0]) / seg_len
+        i = int(np.argmax(d))
+        if d[i] > tolerance:
+            m = a + 1 + i
+            keep[m] = True
+            stack += [(a, m), (m, b)]
+    return keep
+
+
+def compact_frame(frame, project, tolerance, min_extent=0.0, min_points=1):
+    """Drop tiny strokes, join touching ones and simplify them. Strokes with fewer than
+    min_points points or spanning less than min_extent pixels are stray taps and jitters.
+    Returns (points before, points after, strokes dropped)."""
+    strokes = [s for s in frame.strokes if s.display_mode == '3DSPACE' and len(s.points) > 0]
+
+    # Group consecutive strokes whose end touches the next one's start
+    groups = []
+    tiny = []
+    for stroke in strokes:
+        data = read_stroke(stroke)
+        screen = project(data[0])
+        if len(screen) < min_points or np.ptp(screen, axis=0).max() < min_extent:
+            tiny.append(stroke)
+            continue
+        if groups:
+            last = groups[-1]
+            if (last["template"].line_width == stroke.line_width and
+                    np.hypot(*(last["screen"][-1] - screen[0])) <= tolerance):
+                last["strokes"].append(stroke)
+                last["data"] = [np.concatenate((a, b[1:])) for a, b in zip(last["data"], data)]
+                last["screen"] = np.concatenate((last["screen"], screen[1:]))
+                continue
+        groups.append({"template": stroke, "strokes": [stroke], "data": list(data), "screen": screen})
+
+    before = sum(len(s.points) for s in strokes)
+    after = 0
+    for g in groups:
+        keep = simplify_mask(g["screen"], tolerance)
+        after += int(keep.sum())
+        if len(g["strokes"]) == 1 and keep.all():
+            continue
+        write_stroke(frame, g["template"], *(a[keep] for a in g["data"]))
+        for stroke in g["strokes"]:
+            frame.strokes.remove(stroke)
+    for stroke in tiny:
+        frame.strokes.remove(stroke)
+
+    return before, after, len(tiny)
+
+
+# ------------------------------------------------------------------------
+#   Export / Import (the file format is in exchange.py)
+# ------------------------------------------------------------------------
+
+def iter_annotation_records(gp, layers):
+    yield header()
+    for layer in layers:
+        yield {"type": "layer", "info": layer.info, "color": list(layer.color),
+               "thickness": layer.thickness}
+        for frame in layer.frames:
+            yield {"type": "frame", "frame_number": frame.frame_number}
+            for stroke in frame.strokes:
+                co, pressure, strength = read_stroke(stroke)
+                record = {"type": "stroke",
+                          "co": np.round(co, 5).ravel().tolist(),
+                          "pressure": np.round(pressure, 3).tolist(),
+                          "strength": np.round(strength, 3).tolist()}
+                for attr in STROKE_ATTRS:
+                    if hasattr(stroke, attr):
+                        record[attr] = getattr(stroke, attr)
+                yield record
+
+
+def export_annotations(gp, path, annotator_only=True):
+    """Also usable headless, e.g. blender -b shot.blend --python-expr
+       "import bpy; from annotator.strokes import export_annotations; export_annotations(bpy.context.scene.grease_pencil, 'shot.jsonl')" """
+    layers = annotator_layers(gp) if annotator_only else list(gp.layers)
+    with open(path, "w") as f:
+        write_records(f, iter_annotation_records(gp, layers))
+
+
+def import_annotations(scene, path):
+    """Merge an export into the scene's annotations. Returns the number of strokes read."""
+    gp = scene.grease_pencil
+    if gp is None:
+        gp = scene.grease_pencil = bpy.data.grease_pencils.new("Annotations")
+
+    layer, frames, frame = None, {}, None
+    n_strokes = 0
+    for r in read_records(path):
+        if r["type"] == "layer":
+            layer = find_annotation_layer(gp, r["info"]) or gp.layers.new(r["info"], set_active=False)
+            layer.color = r["color"]
+            layer.thickness = r["thickness"]
+            frames = {f.frame_number: f for f in layer.frames}
+        elif r["type"] == "frame":
+            frame = frames.get(r["frame_number"])
+            if frame is None:
+                frame = frames[r["frame_number"]] = layer.frames.new(r["frame_number"])
+        elif r["type"] == "stroke":
+            stroke = write_stroke(frame, None,
+                                  np.array(r["co"], dtype=np.float32).reshape(-1, 3),
+                                  np.array(r["pressure"], dtype=np.float32),
+                                  np.array(r["strength"], dtype=np.float32))
+            for attr in STROKE_ATTRS:
+                if attr in r and hasattr(stroke, attr):
+                    setattr(stroke, attr, r[attr])
+            n_strokes += 1
+    return n_strokes
+
@@ -22,13 +22,16 @@ bl_info = {
     "category": "Rigging"
 }
 
+import time
+_import_start = time.perf_counter()
+
 import bpy
 import mathutils
-from mathutils.kdtree import KDTree
 import re
 import math
 from typing import Union, Tuple, List, Callable, Any
 from functools import reduce
+import functools
 
 from bpy.props import (StringProperty,
                        BoolProperty,
@@ -44,31 +47,18 @@ from bpy.types import (Panel,
                        PropertyGroup,
                        )
 
+from . import instrument
+from .instrument import stage
+from .jobs import ChunkedJob
+from . import mesh_cache
+
+STARTUP_TIMES = {}
+
 
 # ------------------------------------------------------------------------
 #   Utilities
 # ------------------------------------------------------------------------
 
-def move_modifier(obj, source, target, after=False, default_index=0):
-    target_index = obj.modifiers.find(target)
-    move_func = bpy.ops.object.modifier_move_to_index
-    if target_index != -1:
-        source_index = obj.modifiers.find(source)
-        if source_index != -1:
-            if source_index < target_index:
-                if after:
-                    move_func(modifier=source, index=target_index)
-                else:
-                    move_func(modifier=source, index=target_index-1)
-            else:
-                if after:
-                    move_func(modifier=source, index=target_index+1)
-                else:
-                    move_func(modifier=source, index=target_index)
-    else:
-        move_func(modifier=source, index=default_index)
-
-
 def active_and_others(ctx: bpy.types.Context) -> Union[Tuple[bpy.types.Object, List[bpy.types.Object]]]:
     active = ctx.active_object
     selected = ctx.selected_objects
@@ -95,13 +85,11 @@ def selected_one_or_more(ctx: bpy.types.Context, type: str) -> bool:
     return True 
     
 
-def for_each_selected(ctx: bpy.types.Context,
-                      execute: Callable[[bpy.types.Object], Any]):
-    objs = ctx.selected_objects
-    for obj in objs:
-        ctx.view_layer.objects.active = obj
-        execute(obj)
-    
+def right_name(name):
+    """Name of the right side counterpart of a left side name (Foo_L -> Foo_R), or None"""
+    match = re.match(r"^(.+)_L$", name)
+    return f"{match.group(1)}_R" if match else None
+
 
 
 # ------------------------------------------------------------------------
@@ -257,14 +245,6 @@ class SymmetrizeIKConstraints(bpy.types.Operator):
             rb.ik_min_z = -lb.ik_max_z
             rb.ik_max_z = -lb.ik_min_z
 
-        def get_right_bone_name(lbname):
-            p = re.compile(r"^(.+)_L$")
-            match = p.match(lbname)
-            if match:
-                return f"{match.group(1)}_R"
-            else:
-                return None
-
         bpy.ops.object.mode_set(mode = 'EDIT')
 
         selected =  bpy.context.selected_objects
@@ -277,7 +257,7 @@ class SymmetrizeIKConstraints(bpy.types.Operator):
 
         for obj in selected:
             for lb in obj.pose.bones:
-                rbname = get_right_bone_name(lb.name)
+                rbname = right_name(lb.name)
                 rb = obj.pose.bones.get(rbname) if rbname else None
                 if rb:
                     rb.rotation_mode = lb.rotation_mode
@@ -327,7 +307,7 @@ class ClearBoneTransforms(bpy.types.Operator):
 #   Reposition Bones
 # ------------------------------------------------------------------------
 
-class RepositionBones(bpy.types.Operator):
+class RepositionBones(ChunkedJob, bpy.types.Operator):
     bl_idname = "bony.reposition_bones"
     bl_label = "Reposition Bones"
     bl_description = """Reposition bones according shape keys"""
@@ -335,61 +315,73 @@ class RepositionBones(bpy.types.Operator):
 
     N_CLOSEST_VER = 10
 
-    # Custom properties to store original coordinates
-    # So we can reposition more than once
-    bpy.types.PoseBone.bony_original_saved = bpy.props.BoolProperty()
-    bpy.types.PoseBone.bony_original_co_head = bpy.props.FloatVectorProperty(subtype='TRANSLATION')
-    bpy.types.PoseBone.bony_original_co_tail = bpy.props.FloatVectorProperty(subtype='TRANSLATION')
+    @staticmethod
+    def ensure_properties():
+        # Custom properties to store original coordinates
+        # So we can reposition more than once
+        # Registered on first use to keep importing Bony free of side effects
+        if hasattr(bpy.types.PoseBone, "bony_original_saved"):
+            return
+        bpy.types.PoseBone.bony_original_saved = bpy.props.BoolProperty()
+        bpy.types.PoseBone.bony_original_co_head = bpy.props.FloatVectorProperty(subtype='TRANSLATION')
+        bpy.types.PoseBone.bony_original_co_tail = bpy.props.FloatVectorProperty(subtype='TRANSLATION')
+
+    @staticmethod
+    def remove_properties():
+        if hasattr(bpy.types.PoseBone, "bony_original_saved"):
+            del bpy.types.PoseBone.bony_original_saved
+            del bpy.types.PoseBone.bony_original_co_head
+            del bpy.types.PoseBone.bony_original_co_tail
 
     @classmethod
     def poll(cls, context):
         return only_two_selected(context, "ARMATURE", "MESH")
 
 
-    def execute(self, context):
-        def calculate_new_co(co, group_size, evaluated_vertices, raw_vertices, kd):
+    job_stage_name = "edit_bone_writes"
+
+    def job_prepare(self, context):
+        def calculate_new_co(co, group_size, deltas, kd):
             total_weight = 0
             total_delta = mathutils.Vector() 
             for (vc, i, dist) in kd.find_n(co, group_size):
-                ev = evaluated_vertices[i]
-                rv = raw_vertices[i]
                 weight = (
                     1e4 if math.isclose(dist, 0) # don't give close vertices too much weight
                     else 1 / dist
                 )
                 total_weight += weight
-                total_delta += (ev - rv) * weight
+                total_delta += mathutils.Vector(deltas[i]) * weight
             
             return co + total_delta / total_weight
 
+        from mathutils.kdtree import KDTree
+        RepositionBones.ensure_properties()
 
         armature, others = active_and_others(context)
         obj = others[0]
-        mesh = obj.data
 
         # Generative modifier like subsurf changes vertices 
         if any([m.show_viewport and m.type != 'ARMATURE' for m in obj.modifiers]):
             self.report({'ERROR'}, "Please turn off the modifiers first.")
-            return {'CANCELLED'}
+            return None
 
 
-        raw_vertices = []
-        kd = KDTree(len(mesh.vertices))
-        for i, v in enumerate(mesh.vertices):
-            wv = obj.matrix_world @ v.co
-            kd.insert(wv, i)
-            raw_vertices.append(wv)
-        kd.balance()
+        with stage("kd_tree_build"):
+            raw_vertices = mesh_cache.vertices(obj, evaluated=False)
+            kd = KDTree(len(raw_vertices))
+            for i, wv in enumerate(raw_vertices):
+                kd.insert(wv, i)
+            kd.balance()
 
         # vertices deformed by shape keys
-        evaluated_obj = obj.evaluated_get(bpy.context.evaluated_depsgraph_get())
-        evaluated_mesh = evaluated_obj.to_mesh()
-        evaluated_vertices = [evaluated_obj.matrix_world @ v.co for v in evaluated_mesh.vertices]
+        with stage("evaluate"):
+            deltas = mesh_cache.vertices(obj) - raw_vertices
 
         bpy.ops.object.mode_set(mode='EDIT')
 
-        for eb in armature.data.edit_bones:
-            b = armature.pose.bones[eb.name]
+        def reposition(name):
+            eb = armature.data.edit_bones[name]
+            b = armature.pose.bones[name]
             if b.bony_original_saved:
                 # If stored original coordinates are found, just use them
                 head_co = b.bony_original_co_head
@@ -397,8 +389,6 @@ class RepositionBones(bpy.types.Operator):
             else:
                 # Store original coordinates
                 head_co = armature.matrix_world @ eb.head
-                if(eb.name == "ForearmBend_L"):
-                    print(head_co)
                 tail_co = armature.matrix_world @ eb.tail
                 b.bony_original_co_head = head_co
                 b.bony_original_co_tail = tail_co
@@ -406,61 +396,84 @@ class RepositionBones(bpy.types.Operator):
 
                 bpy.context.view_layer.update()
 
-            new_head_co = calculate_new_co(head_co, RepositionBones.N_CLOSEST_VER,
-                                           evaluated_vertices, raw_vertices, kd)
-            new_tail_co = calculate_new_co(tail_co, RepositionBones.N_CLOSEST_VER,
-                                           evaluated_vertices, raw_vertices, kd)
+            new_head_co = calculate_new_co(head_co, RepositionBones.N_CLOSEST_VER, deltas, kd)
+            new_tail_co = calculate_new_co(tail_co, RepositionBones.N_CLOSEST_VER, deltas, kd)
 
             eb.head = armature.matrix_world.inverted() @ new_head_co
             eb.tail = armature.matrix_world.inverted() @ new_tail_co
 
+        # One step per bone
+        return [(None, functools.partial(reposition, eb.name)) for eb in armature.data.edit_bones]
 
-        bpy.context.view_layer.update()
 
-        return {'FINISHED'}
+    def job_finish(self, context):
+        bpy.context.view_layer.update()
 
 
 # ------------------------------------------------------------------------
 #   Transfer Rigging
 # ------------------------------------------------------------------------
 
-def transfer_rigging(source, target):
-    def transfer_vertex_groups():
-        dt = target.modifiers.new("DataTransfer", 'DATA_TRANSFER')
-        dt.object = source
-        dt.use_vert_data = True
-        dt.data_types_verts = {'VGROUP_WEIGHTS'}
-        dt.mix_mode = 'REPLACE'
-        dt.mix_factor = 1.0
-        bpy.context.view_layer.update()
-        bpy.ops.object.modifier_move_to_index(modifier=dt.name, index=0)
-        bpy.ops.object.datalayout_transfer(modifier=dt.name)
-        bpy.ops.object.modifier_apply(modifier=dt.name)
-        bpy.ops.object.vertex_group_remove_unused()
-
-
-    def transfer_armature():
-        # Remove existing armatures if any
-        for m in target.modifiers:
-            if m.type == 'ARMATURE':
-                bpy.ops.object.modifier_remove(modifier=m.name)
-        ar = target.modifiers.new("Armature", 'ARMATURE')
+def transfer_rigging_steps(pairs):
+    """transfer_rigging for many (source, target) pairs, split into steps: add all the
+    transfer modifiers, apply them one target at a time, then bind all the armatures.
+    Operators get a context override, so no step needs its target to be active.
+
+    Weights are mapped by the DataTransfer modifier inside Blender, which evaluates the
+    source itself, so there are no vertex arrays here for mesh_cache to share."""
+    from . import bulk
+
+    armatures = []
+    for source, target in pairs:
         source_ars = [m for m in source.modifiers if m.type == 'ARMATURE']
-        if source_ars:
-            s = source_ars[0]
-            ar.object = s.object
-        else:
-            raise RuntimeError("Source has no armature!")
+        if not source_ars:
+            raise RuntimeError(f"Source {source.name} has no armature!")
+        armatures.append(source_ars[0].object)
+    transfers = []
+
+    def add_transfers():
+        for source, target in pairs:
+            dt = target.modifiers.new("DataTransfer", 'DATA_TRANSFER')
+            dt.object = source
+            dt.use_vert_data = True
+            dt.data_types_verts = {'VGROUP_WEIGHTS'}
+            dt.mix_mode = 'REPLACE'
+            dt.mix_factor = 1.0
+            transfers.append((target, dt.name))
+        # One update for all the targets
         bpy.context.view_layer.update()
-        bpy.ops.object.modifier_move_to_index(modifier=ar.name, index=0)
 
+    def transfer_vertex_groups(i):
+        target, name = transfers[i]
+        bulk.run_on(target, bpy.ops.object.modifier_move_to_index, modifier=name, index=0)
+        bulk.run_on(target, bpy.ops.object.datalayout_transfer, modifier=name)
+        bulk.run_on(target, bpy.ops.object.modifier_apply, modifier=name)
+        bulk.run_on(target, bpy.ops.object.vertex_group_remove_unused)
 
-    transfer_vertex_groups()
-    transfer_armature()
+    def transfer_armatures():
+        for (_, target), armature in zip(pairs, armatures):
+            # Remove existing armatures if any
+            for m in [m for m in target.modifiers if m.type == 'ARMATURE']:
+                target.modifiers.remove(m)
+            ar = target.modifiers.new("Armature", 'ARMATURE')
+            ar.object = armature
+            bulk.run_on(target, bpy.ops.object.modifier_move_to_index, modifier=ar.name, index=0)
+
+    return ([add_transfers] + [functools.partial(transfer_vertex_groups, i) for i in range(len(pairs))]
+            + [transfer_armatures])
+
+
+def transfer_rigging(source, target):
+    *vertex_groups, armatures = transfer_rigging_steps([(source, target)])
+    with stage("transfer_vertex_groups"):
+        for step in vertex_groups:
+            step()
+    with stage("transfer_armature"):
+        armatures()
 
         
 
-class TransferRigging(bpy.types.Operator):
+class TransferRigging(ChunkedJob, bpy.types.Operator):
     bl_idname = "bony.transfer_rigging"
     bl_label = "Transfer Rigging"
     bl_description = """Transfer riggin from another mesh"""
@@ -471,12 +484,159 @@ class TransferRigging(bpy.types.Operator):
         return  selected_one_or_more(context, 'MESH')
 
 
-    def execute(self, context):
+    def job_prepare(self, context):
         settings = context.scene.bony_settings
         source = settings.transfer_source
+        if source is None:
+            self.report({'ERROR'}, "Pick a transfer source first")
+            return None
 
-        for_each_selected(context, lambda obj: transfer_rigging(source, obj))
-        
+        pairs = [(source, obj) for obj in context.selected_objects if obj != source]
+        try:
+            steps = transfer_rigging_steps(pairs)
+        except RuntimeError as e:
+            self.report({'ERROR'}, str(e))
+            return None
+        return [(None, step) for step in steps]
+
+
+    def job_finish(self, context):
+        bpy.context.view_layer.update()
+
+
+
+# ------------------------------------------------------------------------
+#   Proxies
+# ------------------------------------------------------------------------
+
+PROXY_COLLECTION_NAME = "Bony Proxies"
+PROXY_SUFFIX = ".proxy"
+
+
+def proxy_collection(scene):
+    coll = bpy.data.collections.get(PROXY_COLLECTION_NAME)
+    if coll is None:
+        coll = bpy.data.collections.new(PROXY_COLLECTION_NAME)
+    if coll.name not in scene.collection.children:
+        scene.collection.children.link(coll)
+    return coll
+
+
+def proxies(scene):
+    coll = bpy.data.collections.get(PROXY_COLLECTION_NAME)
+    if coll is None:
+        return []
+    return [o for o in coll.objects if o.bony_proxy_source is not None]
+
+
+def remove_proxy(obj):
+    mesh = obj.data
+    bpy.data.objects.remove(obj)
+    if mesh.users == 0:
+        bpy.data.meshes.remove(mesh)
+
+
+class GenerateProxies(ChunkedJob, bpy.types.Operator):
+    bl_idname = "bony.generate_proxies"
+    bl_label = "Generate Proxies"
+    bl_description = """Create decimated copies of the selected rigged meshes, without their other modifiers,
+                        bound to the same armature (in the "Bony Proxies" collection)"""
+    bl_options = {'REGISTER', 'UNDO'}
+
+    ratio: bpy.props.FloatProperty(name="Ratio", description="Share of faces to keep",
+                                   default=0.1, min=0.001, max=1)
+
+    @classmethod
+    def poll(cls, context):
+        return selected_one_or_more(context, 'MESH')
+
+
+    def job_prepare(self, context):
+        sources = [o for o in context.selected_objects if o.bony_proxy_source is None
+                   and any(m.type == 'ARMATURE' and m.object for m in o.modifiers)]
+        if not sources:
+            self.report({'ERROR'}, "No selected mesh has an armature")
+            return None
+
+        coll = proxy_collection(context.scene)
+        for old in proxies(context.scene):
+            if old.bony_proxy_source in sources:
+                remove_proxy(old)
+
+        # Decimate all the proxies in one depsgraph evaluation. They share their source's
+        # mesh until then, so the shape key mix is baked in too.
+        with stage("decimate"):
+            pairs = []
+            for src in sources:
+                proxy = bpy.data.objects.new(src.name + PROXY_SUFFIX, src.data)
+                # Same parenting, so the proxy follows whatever moves its source
+                proxy.parent = src.parent
+                proxy.parent_type = src.parent_type
+                proxy.parent_bone = src.parent_bone
+                proxy.parent_vertices = src.parent_vertices
+                proxy.matrix_parent_inverse = src.matrix_parent_inverse
+                proxy.matrix_basis = src.matrix_basis
+                proxy.hide_render = True
+                proxy.bony_proxy_source = src
+                decimate = proxy.modifiers.new("Decimate", 'DECIMATE')
+                decimate.ratio = self.ratio
+                coll.objects.link(proxy)
+                pairs.append((src, proxy))
+
+            depsgraph = context.evaluated_depsgraph_get()
+            for src, proxy in pairs:
+                proxy.data = bpy.data.meshes.new_from_object(proxy.evaluated_get(depsgraph))
+                proxy.data.name = proxy.name
+                proxy.modifiers.clear()
+
+        for o in context.selected_objects:
+            o.select_set(False)
+        for _, proxy in pairs:
+            proxy.select_set(True)
+
+        self._source_names = [src.name for src, _ in pairs]
+        return [(None, step) for step in transfer_rigging_steps(pairs)]
+
+
+    def job_finish(self, context):
+        # Sources must stay evaluated until their weights are transferred
+        for name in self._source_names:
+            bpy.data.objects[name].hide_viewport = True
+        bpy.context.view_layer.update()
+
+
+class SwapProxies(bpy.types.Operator):
+    bl_idname = "bony.swap_proxies"
+    bl_label = "Swap Proxies"
+    bl_description = """Switch the viewport between full resolution meshes and their proxies.
+                        Hidden meshes are left out of the depsgraph, so their modifiers aren't evaluated"""
+    bl_options = {'REGISTER', 'UNDO'}
+
+    display: bpy.props.EnumProperty(
+            items = [('TOGGLE', 'Toggle', 'Show whichever is hidden now'),
+                     ('PROXY', 'Proxies', 'Show the proxies'),
+                     ('FULL', 'Full Resolution', 'Show the full resolution meshes')],
+            name = "Display",
+            default = 'TOGGLE')
+
+    @classmethod
+    def poll(cls, context):
+        return len(proxies(context.scene)) > 0
+
+
+    def execute(self, context):
+        pairs = proxies(context.scene)
+        if self.display == 'TOGGLE':
+            show_proxies = all(p.hide_viewport for p in pairs)
+        else:
+            show_proxies = self.display == 'PROXY'
+
+        # Only visibility flags change, nothing gets rebuilt
+        for proxy in pairs:
+            proxy.hide_viewport = not show_proxies
+            proxy.bony_proxy_source.hide_viewport = show_proxies
+
+        self.report({'INFO'}, f"Showing {'proxies' if show_proxies else 'full resolution meshes'}")
         return {'FINISHED'}
 
             
@@ -527,34 +687,55 @@ def apply_shape_key(obj):
         obj.shape_key_add(name='CombinedKeys', from_mix=True)
         for shapeKey in obj.data.shape_keys.key_blocks:
             obj.shape_key_remove(shapeKey)
+        mesh_cache.invalidate(obj)
 
 
-def merge_non_corrective_shape_keys(obj):
-    MERGED_KEY_NAME = 'MergedKey'
+MERGED_KEY_NAME = 'MergedKey'
+
+
+def merge_non_corrective_steps(obj):
+    """merge_non_corrective_shape_keys split into steps: one per key block, then the merge"""
     to_remove = []
-    if hasattr(obj.data, "shape_keys"):
+    key_names = [kb.name for kb in obj.data.shape_keys.key_blocks[1:]] if obj.data.shape_keys else [] # Skip Basis
+
+    def add_merged_key():
         obj.shape_key_add(name=MERGED_KEY_NAME, from_mix=True)
-        for shape_key in obj.data.shape_keys.key_blocks[1:]: # Skip Basis
-            if shape_key.name == MERGED_KEY_NAME:
-                shape_key.value = 1
-            elif has_only_single_property_recur(shape_key):
-                to_remove.append(shape_key)
-    
-    for shape_key in to_remove:
-        obj.shape_key_remove(shape_key)
+        obj.data.shape_keys.key_blocks[MERGED_KEY_NAME].value = 1
+
+    def check(name):
+        shape_key = obj.data.shape_keys.key_blocks[name]
+        if has_only_single_property_recur(shape_key):
+            to_remove.append(name)
+
+    def merge():
+        key_blocks = obj.data.shape_keys.key_blocks
+        for name in to_remove:
+            obj.shape_key_remove(key_blocks[name])
 
-    # Blend the new merged key into Basis 
-    obj.active_shape_key_index = 0
-    bpy.ops.object.editmode_toggle()
-    bpy.ops.mesh.select_all(action='SELECT')
-    bpy.ops.mesh.blend_from_shape(shape=MERGED_KEY_NAME)
-    bpy.ops.object.editmode_toggle()
-    merged = obj.data.shape_keys.key_blocks[MERGED_KEY_NAME]
-    merged.value = 0
-    obj.shape_key_remove(merged)
+        # Blend the new merged key into Basis 
+        obj.active_shape_key_index = 0
+        bpy.ops.object.editmode_toggle()
+        bpy.ops.mesh.select_all(action='SELECT')
+        bpy.ops.mesh.blend_from_shape(shape=MERGED_KEY_NAME)
+        bpy.ops.object.editmode_toggle()
+        merged = key_blocks[MERGED_KEY_NAME]
+        merged.value = 0
+        obj.shape_key_remove(merged)
+        mesh_cache.invalidate(obj)
 
+    return [add_merged_key] + [functools.partial(check, n) for n in key_names] + [merge]
+
+
+def merge_non_corrective_shape_keys(obj):
+    *find, merge = merge_non_corrective_steps(obj)
+    with stage("find_non_corrective"):
+        for step in find:
+            step()
+    with stage("blend_into_basis"):
+        merge()
 
-class ApplyShapeKeys(bpy.types.Operator):
+
+class ApplyShapeKeys(ChunkedJob, bpy.types.Operator):
     bl_idname = "bony.apply_shape_keys"
     bl_label = "Apply Shape Keys"
     bl_description = """Apply all shape keys for selected meshes"""
@@ -572,12 +753,25 @@ class ApplyShapeKeys(bpy.types.Operator):
 
         return True
 
-    def execute(self, context):
-        for_each_selected(context, apply_shape_key)
-        return {'FINISHED'}
+    def job_prepare(self, context):
+        from . import bulk, shape_keys
+
+        objs = [obj for obj in context.selected_objects if obj.data.shape_keys]
+        batched = [obj for obj in objs if shape_keys.supported(obj)]
 
+        def apply_chunk(chunk):
+            for obj, co in bulk.map_objects(chunk, shape_keys.gather, shape_keys.mix):
+                shape_keys.write_applied(obj, co)
 
-class MergeNonCorrectiveShapeKeys(bpy.types.Operator):
+        return ([(None, functools.partial(apply_chunk, chunk)) for chunk in bulk.chunks(batched)]
+                + [(obj, functools.partial(apply_shape_key, obj)) for obj in objs if obj not in batched])
+
+
+    def job_finish(self, context):
+        bpy.context.view_layer.update()
+
+
+class MergeNonCorrectiveShapeKeys(ChunkedJob, bpy.types.Operator):
     bl_idname = "bony.merge_non_corrective_shape_keys"
     bl_label = "Merge Non-Corrective Keys"
     bl_description = """Merge all corrective keys (e.g. Daz's JCM) into one"""
@@ -596,8 +790,101 @@ class MergeNonCorrectiveShapeKeys(bpy.types.Operator):
         return True
 
 
+    def job_prepare(self, context):
+        from . import bulk, shape_keys
+
+        objs = [obj for obj in context.selected_objects if obj.data.shape_keys]
+        batched = [obj for obj in objs if shape_keys.supported(obj)]
+
+        removed = {obj: [] for obj in batched}
+
+        # Drivers are looked up on the main thread one key block per step, as Daz figures
+        # have thousands. Only the mixing runs in the pool.
+        def check(obj, name):
+            if has_only_single_property_recur(obj.data.shape_keys.key_blocks[name]):
+                removed[obj].append(name)
+
+        def merge_chunk(chunk):
+            merged = bulk.map_objects(chunk,
+                                      lambda obj: (shape_keys.gather(obj), removed[obj]),
+                                      lambda data: shape_keys.merge_into_basis(*data))
+            for obj, result in merged:
+                shape_keys.write_merged(obj, removed[obj], result)
+
+        return ([(None, functools.partial(check, obj, kb.name))
+                 for obj in batched for kb in obj.data.shape_keys.key_blocks[1:]] # Skip Basis
+                + [(None, functools.partial(merge_chunk, chunk)) for chunk in bulk.chunks(batched)]
+                + [(obj, step) for obj in objs if obj not in batched for step in merge_non_corrective_steps(obj)])
+
+
+    def job_finish(self, context):
+        bpy.context.view_layer.update()
+
+
+
+# ------------------------------------------------------------------------
+#   Mirror Weights and Shape Keys
+# ------------------------------------------------------------------------
+
+class MirrorVertexGroups(bpy.types.Operator):
+    bl_idname = "bony.mirror_vertex_groups"
+    bl_label = "Mirror Weights"
+    bl_description = """Copy the weights of all _L vertex groups to their _R counterparts, mirrored across X"""
+    bl_options = {'REGISTER', 'UNDO'}
+
+    tolerance: bpy.props.FloatProperty(name="Tolerance", default=1e-4, min=1e-7, precision=6)
+
+    @classmethod
+    def poll(cls, context):
+        return selected_one_or_more(context, 'MESH')
+
+
+    def execute(self, context):
+        from . import mirror
+
+        if context.mode != 'OBJECT':
+            bpy.ops.object.mode_set(mode='OBJECT')
+
+        written = 0
+        for obj in context.selected_objects:
+            with stage("mirror_map"):
+                mirror_map = mirror.mirror_map(obj, self.tolerance)
+            with stage("mirror_vertex_groups"):
+                written += mirror.mirror_vertex_groups(obj, mirror_map, right_name)
+        context.view_layer.update()
+
+        self.report({'INFO'}, f"Mirrored {written} vertex group(s)")
+        return {'FINISHED'}
+
+
+class MirrorShapeKeys(bpy.types.Operator):
+    bl_idname = "bony.mirror_shape_keys"
+    bl_label = "Mirror Shape Keys"
+    bl_description = """Write the deltas of all _L shape keys into their _R counterparts, mirrored across X"""
+    bl_options = {'REGISTER', 'UNDO'}
+
+    tolerance: bpy.props.FloatProperty(name="Tolerance", default=1e-4, min=1e-7, precision=6)
+
+    @classmethod
+    def poll(cls, context):
+        return selected_one_or_more(context, 'MESH')
+
+
     def execute(self, context):
-        for_each_selected(context, merge_non_corrective_shape_keys)
+        from . import mirror
+
+        if context.mode != 'OBJECT':
+            bpy.ops.object.mode_set(mode='OBJECT')
+
+        written = 0
+        for obj in context.selected_objects:
+            with stage("mirror_map"):
+                mirror_map = mirror.mirror_map(obj, self.tolerance)
+            with stage("mirror_shape_keys"):
+                written += mirror.mirror_shape_keys(obj, mirror_map, right_name)
+        context.view_layer.update()
+
+        self.report({'INFO'}, f"Mirrored {written} shape key(s)")
         return {'FINISHED'}
 
 
@@ -652,7 +939,7 @@ class InitializeClothing(bpy.types.Operator):
             bpy.ops.object.vertex_group_remove(all=True)
 
             for i in range(len(obj.material_slots)):
-                bpy.ops.object.material_slot_remove({'object': obj})
+                bpy.ops.object.material_slot_remove()
             
             bpy.ops.object.origin_set(type='ORIGIN_GEOMETRY', center='BOUNDS')
 
@@ -682,35 +969,237 @@ class InitializeClothing(bpy.types.Operator):
 
         def prepare_modifiers():
             obj = context.active_object
-            mirror = obj.modifiers.get("Mirror")
-            if mirror:
-                move_modifier(context.active_object, 'Mirror', "Armature")
             solidify = obj.modifiers.get("Solidify")
             if solidify:
                 solidify.thickness = 0.005
-                move_modifier(context.active_object, 'Solidify', "Armature", after=True)
             subdiv = obj.modifiers.get("Subdivision")
             if subdiv:
                 subdiv.levels = 1
-                bpy.ops.object.modifier_move_to_index(modifier="Subdivision", index=(len(obj.modifiers) - 1))
+            # Mirror before Armature, Solidify after it, Subdivision last
+            from . import modifier_stack
+            modifier_stack.reorder(obj, modifier_stack.sorted_names(obj.modifiers))
                 
         
-        duplicate_separate_mesh()
+        with stage("duplicate_separate_mesh"):
+            duplicate_separate_mesh()
         active_clothing()
-        apply_shape_key(context.active_object)
-        cleanup_clothing()
+        with stage("apply_shape_key"):
+            apply_shape_key(context.active_object)
+        with stage("cleanup_clothing"):
+            cleanup_clothing()
         try:
             # Skip if Auto Mirro isn't installed
-            auto_mirror()
+            with stage("auto_mirror"):
+                auto_mirror()
         except AttributeError:
             pass
-        add_thickness()
-        prepare_modifiers()
+        with stage("add_thickness"):
+            add_thickness()
+        with stage("prepare_modifiers"):
+            prepare_modifiers()
+
+
+        return {'FINISHED'}
+
+
+
+
+# ------------------------------------------------------------------------
+#   Modifier Stacks
+# ------------------------------------------------------------------------
+
+def stack_targets(context, scope):
+    objs = context.selected_objects if scope == 'SELECTED' else context.scene.objects
+    return [o for o in objs if o.type == 'MESH' and len(o.modifiers) > 0]
+
+
+class AnalyzeModifierStacks(bpy.types.Operator):
+    bl_idname = "bony.analyze_modifier_stacks"
+    bl_label = "Analyze Modifier Stacks"
+    bl_description = """Estimate the per-frame cost of modifier stacks and list what could be fixed"""
+    bl_options = {'REGISTER'}
+
+    scope: bpy.props.EnumProperty(
+            items = [('SELECTED', 'Selected', 'Selected meshes'),
+                     ('SCENE', 'Scene', 'All meshes in the scene')],
+            name = "Scope",
+            default = 'SCENE')
+    max_viewport_levels: bpy.props.IntProperty(name="Max Viewport Subdivision", default=1, min=0)
+
+    def execute(self, context):
+        from . import modifier_stack
+
+        try:
+            rules = modifier_stack.scene_rules(context.scene.bony_settings)
+        except (OSError, ValueError) as e:
+            self.report({'ERROR'}, str(e))
+            return {'CANCELLED'}
+        reports = [modifier_stack.analyze(o, self.max_viewport_levels, rules)
+                   for o in stack_targets(context, self.scope)]
+        reports.sort(key=lambda r: r.cost, reverse=True)
+
+        total = sum(r.cost for r in reports)
+        optimized = sum(r.optimized_cost for r in reports)
+        for r in reports:
+            print(f"{r.obj.name}: cost {r.cost:.3g} -> {r.optimized_cost:.3g}")
+            for i in r.issues:
+                print(f"    {i.modifier or ''} {i.message}")
+
+        n_issues = sum(len(r.issues) for r in reports)
+        self.report({'INFO'}, f"{n_issues} issue(s) in {len(reports)} stack(s), "
+                              f"estimated cost {total:.3g} -> {optimized:.3g} (details in console)")
+        return {'FINISHED'}
+
+
+class OptimizeModifierStacks(bpy.types.Operator):
+    bl_idname = "bony.optimize_modifier_stacks"
+    bl_label = "Optimize Modifier Stacks"
+    bl_description = """Reorder modifiers, remove duplicated and no-op ones and cap viewport subdivision"""
+    bl_options = {'REGISTER', 'UNDO'}
+
+    scope: bpy.props.EnumProperty(
+            items = [('SELECTED', 'Selected', 'Selected meshes'),
+                     ('SCENE', 'Scene', 'All meshes in the scene')],
+            name = "Scope",
+            default = 'SELECTED')
+    max_viewport_levels: bpy.props.IntProperty(name="Max Viewport Subdivision", default=1, min=0)
+    fix_order: bpy.props.BoolProperty(name="Reorder", default=True)
+    remove_noops: bpy.props.BoolProperty(name="Remove No-ops and Duplicates", default=True)
+    cap_levels: bpy.props.BoolProperty(name="Cap Viewport Levels", default=True)
+
+    def execute(self, context):
+        from . import modifier_stack
+
+        try:
+            rules = modifier_stack.scene_rules(context.scene.bony_settings)
+        except (OSError, ValueError) as e:
+            self.report({'ERROR'}, str(e))
+            return {'CANCELLED'}
+
+        before, after, fixed = 0, 0, 0
+        for obj in stack_targets(context, self.scope):
+            report = modifier_stack.analyze(obj, self.max_viewport_levels, rules)
+            before += report.cost
+            modifier_stack.fix(obj, report.issues, self.max_viewport_levels,
+                               remove=self.remove_noops, order=self.fix_order, levels=self.cap_levels, rules=rules)
+            after += modifier_stack.stack_cost(obj, obj.modifiers, rules=rules)
+            fixed += len(report.issues) > 0
+
+        # One update for all the stacks
+        context.view_layer.update()
+
+        self.report({'INFO'}, f"Fixed {fixed} stack(s), estimated cost {before:.3g} -> {after:.3g}")
+        return {'FINISHED'}
+
+
+
+# ------------------------------------------------------------------------
+#   Unused Bones
+# ------------------------------------------------------------------------
+
+def format_bone_savings(reports):
+    bones = sum(r.bones for r in reports)
+    unused = sum(len(r.unused) for r in reports)
+    entries = sum(r.weight_entries for r in reports)
+    removed = sum(r.removed_entries for r in reports)
+    share = removed / entries * 100 if entries else 0
+    return (f"{unused}/{bones} bone(s) unused, {removed}/{entries} weight entries "
+            f"(~{share:.1f}% of armature deform work)")
+
+
+class AnalyzeUnusedBones(bpy.types.Operator):
+    bl_idname = "bony.analyze_unused_bones"
+    bl_label = "Analyze Unused Bones"
+    bl_description = """List bones without meaningful weights, constraints targeting them, drivers or animation"""
+    bl_options = {'REGISTER'}
 
+    min_weight: bpy.props.FloatProperty(name="Min Weight", default=0.01, min=0, max=1)
 
+    @classmethod
+    def poll(cls, context):
+        return selected_one_or_more(context, 'ARMATURE')
+
+
+    def execute(self, context):
+        from . import bone_usage
+
+        reports = [bone_usage.analyze(obj, self.min_weight) for obj in context.selected_objects]
+        for r in reports:
+            print(f"{r.armature.name}: {len(r.unused)}/{r.bones} unused, deforming {len(r.meshes)} mesh(es)")
+            for name in r.unused:
+                print(f"    {name}")
+
+        self.report({'INFO'}, f"{format_bone_savings(reports)} (details in console)")
         return {'FINISHED'}
 
 
+class DissolveUnusedBones(bpy.types.Operator):
+    bl_idname = "bony.dissolve_unused_bones"
+    bl_label = "Dissolve Unused Bones"
+    bl_description = """Remove unused bones and their vertex groups, reparenting their children
+                        and adding leftover weights to the parent's group"""
+    bl_options = {'REGISTER', 'UNDO'}
+
+    min_weight: bpy.props.FloatProperty(name="Min Weight", default=0.01, min=0, max=1)
+
+    @classmethod
+    def poll(cls, context):
+        return (selected_one_or_more(context, 'ARMATURE')
+                and context.active_object in context.selected_objects)
+
+
+    def execute(self, context):
+        from . import bone_usage
+
+        if context.mode != 'OBJECT':
+            bpy.ops.object.mode_set(mode='OBJECT')
+
+        with stage("analyze"):
+            reports = [bone_usage.analyze(obj, self.min_weight) for obj in context.selected_objects]
+        reports = [r for r in reports if r.unused]
+        if not reports:
+            self.report({'INFO'}, "No unused bones")
+            return {'FINISHED'}
+
+        with stage("dissolve"):
+            bone_usage.dissolve(reports)
+        context.view_layer.update()
+
+        self.report({'INFO'}, f"Dissolved {format_bone_savings(reports)}")
+        return {'FINISHED'}
+
+
+
+# ------------------------------------------------------------------------
+#   Memory Report
+# ------------------------------------------------------------------------
+
+class MemoryReport(bpy.types.Operator):
+    bl_idname = "bony.memory_report"
+    bl_label = "Memory Report"
+    bl_description = """Estimate memory used by shape keys, weights, evaluated meshes, animation and annotations,
+                        print the largest contributors and export the report as JSON"""
+    bl_options = {'REGISTER'}
+
+    limit: bpy.props.IntProperty(name="Rows", description="Contributors to print", default=20, min=1)
+
+    def execute(self, context):
+        from . import footprint
+
+        with stage("collect"):
+            entries = footprint.collect(context)
+        footprint.print_report(entries, self.limit)
+
+        path = context.scene.bony_settings.memory_report_path
+        if path:
+            path = bpy.path.abspath(path)
+            footprint.write_report(entries, path)
+
+        total = footprint.format_bytes(sum(e.bytes for e in entries))
+        top = f", largest: {entries[0].datablock} {entries[0].category}" if entries else ""
+        self.report({'INFO'}, f"Estimated {total}{top} (details in console)")
+        return {'FINISHED'}
+
 
 
 # ------------------------------------------------------------------------
@@ -745,6 +1234,8 @@ class Bony_PT_Object(bpy.types.Panel):
         col1.operator(SymmetrizeIKConstraints.bl_idname, icon="BONE_DATA")
         col1.operator(ClearBoneTransforms.bl_idname, icon="OUTLINER_OB_ARMATURE")
         col1.operator(RepositionBones.bl_idname, icon="OUTLINER_OB_ARMATURE")
+        col1.operator(AnalyzeUnusedBones.bl_idname, icon="BONE_DATA")
+        col1.operator(DissolveUnusedBones.bl_idname, icon="BONE_DATA")
 
         box = col1.box()
         col1_1 = box.row()
@@ -753,16 +1244,33 @@ class Bony_PT_Object(bpy.types.Panel):
         split.prop_search(settings, 'transfer_source', context.scene, "objects", text="")
         box.operator(TransferRigging.bl_idname, icon="OUTLINER_OB_ARMATURE")
 
+        row = col1.row(align=True)
+        row.operator(GenerateProxies.bl_idname, icon="MOD_DECIM")
+        row.operator(SwapProxies.bl_idname, icon="HIDE_OFF")
+
         layout.label(text="Mesh: ")
         col2 = layout.column(align=True)
         col2.operator(ApplyShapeKeys.bl_idname, icon="SHAPEKEY_DATA")
         col2.operator(MergeNonCorrectiveShapeKeys.bl_idname, icon="SHAPEKEY_DATA")
+        col2.operator(MirrorVertexGroups.bl_idname, icon="MOD_MIRROR")
+        col2.operator(MirrorShapeKeys.bl_idname, icon="MOD_MIRROR")
+        col2.operator(AnalyzeModifierStacks.bl_idname, icon="MODIFIER")
+        col2.operator(OptimizeModifierStacks.bl_idname, icon="MODIFIER")
+        col2.prop(settings, "modifier_order", text="")
+        col2.prop(settings, "modifier_costs_path", text="")
 
         layout.label(text="For Daz3D: ")
         col3 = layout.column(align=True)
         col3.operator(RenameDazBones.bl_idname, icon="BONE_DATA")
 
+        layout.label(text="Scene: ")
+        col4 = layout.column(align=True)
+        col4.operator(MemoryReport.bl_idname, icon="MEMORY")
+        col4.prop(settings, "memory_report_path", text="")
+
         layout.separator()
+        layout.prop(settings, "job_time_budget")
+        layout.prop(settings, "mesh_cache_budget_mb")
 
         
 class Bony_PT_Mesh(bpy.types.Panel):
@@ -792,6 +1300,27 @@ class Bony_PT_Mesh(bpy.types.Panel):
 
 class BonySettings(bpy.types.PropertyGroup):
     transfer_source:  bpy.props.PointerProperty(type=bpy.types.Object, name='Transfer Source')
+    trace_path: bpy.props.StringProperty(name='Trace Path', subtype='FILE_PATH', default='//bony_trace.json')
+    memory_report_path: bpy.props.StringProperty(name='Memory Report Path', subtype='FILE_PATH',
+                                                 default='//bony_memory.json')
+    modifier_order: bpy.props.StringProperty(
+        name='Modifier Order',
+        description='Stages modifier stacks are sorted into, separated by ";" '
+                    '(e.g. "MIRROR; ARMATURE; SOLIDIFY; SUBSURF MULTIRES"). Empty for the built-in order',
+        default='')
+    modifier_costs_path: bpy.props.StringProperty(
+        name='Modifier Costs',
+        description='JSON file of {"TYPE": [cost per vertex, vertex count multiplier]} replacing '
+                    'the built-in cost estimates. Empty for the built-in ones',
+        subtype='FILE_PATH', default='')
+    mesh_cache_budget_mb: bpy.props.IntProperty(
+        name='Mesh Cache (MB)',
+        description='Memory evaluated vertex arrays shared between Bony operators may use',
+        default=mesh_cache.DEFAULT_BUDGET_MB, min=0)
+    job_time_budget: bpy.props.FloatProperty(
+        name='Time Budget (ms)',
+        description='How long long-running operators may work before letting the UI redraw',
+        default=50, min=5)
 
 
 CLASSES_TO_REGISTER = [
@@ -803,22 +1332,43 @@ CLASSES_TO_REGISTER = [
     SymmetrizeIKConstraints,
     ClearBoneTransforms,
     TransferRigging,
+    GenerateProxies,
+    SwapProxies,
     RenameDazBones,
     ApplyShapeKeys,
     MergeNonCorrectiveShapeKeys,
+    MirrorVertexGroups,
+    MirrorShapeKeys,
     InitializeClothing,
     RepositionBones,
-]
+    AnalyzeModifierStacks,
+    OptimizeModifierStacks,
+    AnalyzeUnusedBones,
+    DissolveUnusedBones,
+    MemoryReport,
+] + instrument.CLASSES_TO_REGISTER
 
 
 def register():
+    start = time.perf_counter()
+    instrument.instrument_operators(CLASSES_TO_REGISTER)
     [bpy.utils.register_class(klass) for klass in CLASSES_TO_REGISTER]
     bpy.types.Scene.bony_settings = bpy.props.PointerProperty(type=BonySettings)
+    bpy.types.Object.bony_proxy_source = bpy.props.PointerProperty(type=bpy.types.Object, name='Proxy Of')
+    mesh_cache.register()
+    STARTUP_TIMES["register"] = time.perf_counter() - start
 
 
 def unregister():
+    instrument.disable()
+    mesh_cache.unregister()
+    RepositionBones.remove_properties()
     try:
         [bpy.utils.unregister_class(klass) for klass in CLASSES_TO_REGISTER]
         del bpy.types.Scene.bony_settings
+        del bpy.types.Object.bony_proxy_source
     except RuntimeError:
-        pass
\ No newline at end of file
+        pass
+
+
+STARTUP_TIMES["import"] = time.perf_counter() - _import_start
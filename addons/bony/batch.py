@@ -0,0 +1,217 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTIBILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Run a pipeline of Bony operators over many .blend files.
+
+    python bony/batch.py --blender /path/to/blender --pipeline pipeline.json \
+        --output-dir prepared/ --jobs 8 --report report.json characters/*.blend
+
+Every file is processed by its own `blender --background` worker, at most
+--jobs at a time, so a crash or error only fails that file. The pipeline
+is a JSON file listing steps in order:
+
+    {"steps": [
+        {"op": "rename_daz_bones", "objects": ["Genesis8"]},
+        {"op": "merge_non_corrective_shape_keys", "objects": ["Genesis8.Shape"]},
+        {"op": "reposition_bones", "active": "Genesis8", "objects": ["Genesis8", "Genesis8.Shape"]},
+        {"op": "transfer_rigging", "objects": ["Shirt"], "transfer_source": "Genesis8.Shape"}
+    ]}
+
+"objects" are selected (the first one, or "active", is made active) and
+"params" are passed to the operator as keyword arguments.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+ADDONS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STEPS = {
+    "copy_custom_shapes",
+    "copy_custom_properties",
+    "rename_daz_bones",
+    "symmetrize_ik_constraints",
+    "clear_bone_transforms",
+    "reposition_bones",
+    "transfer_rigging",
+    "apply_shape_keys",
+    "merge_non_corrective_shape_keys",
+    "dissolve_unused_bones",
+    "mirror_vertex_groups",
+    "mirror_shape_keys",
+}
+
+
+def validate_pipeline(pipeline):
+    steps = pipeline.get("steps")
+    if not steps:
+        raise ValueError("Pipeline has no steps")
+    for i, step in enumerate(steps):
+        if step.get("op") not in STEPS:
+            raise ValueError(f"Step {i}: unknown operator {step.get('op')!r}")
+        if not step.get("objects"):
+            raise ValueError(f"Step {i}: no objects to select")
+
+
+# ------------------------------------------------------------------------
+#   Inside Blender
+# ------------------------------------------------------------------------
+
+def run_step(step):
+    import bpy
+
+    scene = bpy.context.scene
+    objs = [bpy.data.objects[name] for name in step["objects"]]
+    active = bpy.data.objects[step["active"]] if "active" in step else objs[0]
+
+    if bpy.context.mode != 'OBJECT':
+        bpy.ops.object.mode_set(mode='OBJECT')
+    for o in bpy.context.selected_objects:
+        o.select_set(False)
+    for o in objs:
+        o.select_set(True)
+    bpy.context.view_layer.objects.active = active
+
+    if "transfer_source" in step:
+        scene.bony_settings.transfer_source = bpy.data.objects[step["transfer_source"]]
+
+    result = getattr(bpy.ops.bony, step["op"])(**step.get("params", {}))
+    if 'FINISHED' not in result:
+        raise RuntimeError(f"{step['op']} returned {result}")
+
+
+def run_pipeline(pipeline, output, result_path):
+    import bpy
+
+    sys.path.insert(0, ADDONS_DIR)
+    import bony
+    bony.register()
+
+    result = {"ok": True, "error": None, "steps": []}
+    try:
+        for step in pipeline["steps"]:
+            with bony.instrument.Span(step["op"], "batch") as span:
+                run_step(step)
+            result["steps"].append({"op": step["op"], "wall_s": span.duration,
+                                    "ops_calls": span.ops_calls, "mode_switches": span.mode_switches})
+        bpy.ops.wm.save_as_mainfile(filepath=output)
+    except Exception as e:
+        result["ok"] = False
+        result["error"] = f"{type(e).__name__}: {e}"
+
+    with open(result_path, "w") as f:
+        json.dump(result, f)
+
+
+# ------------------------------------------------------------------------
+#   Driver
+# ------------------------------------------------------------------------
+
+def output_path(path, args):
+    """Where the result of path is saved. Under --output-dir, files keep their path relative
+    to the directory all the inputs share, so characters/a/body.blend and characters/b/body.blend
+    don't overwrite each other."""
+    if not args.output_dir:
+        return path
+    output = os.path.join(args.output_dir, os.path.relpath(os.path.abspath(path), args.input_root))
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    return output
+
+
+def process_file(path, args):
+    output = output_path(path, args)
+    result_path = f"{output}.bony-batch.json"
+    if os.path.exists(result_path):
+        os.remove(result_path)
+
+    cmd = [args.blender, "--background", "--factory-startup", "-t", str(args.threads), path,
+           "--python", os.path.abspath(__file__), "--",
+           "--worker", "--pipeline", args.pipeline, "--output", output, "--result", result_path]
+    start = time.perf_counter()
+    report = {"file": path, "output": output}
+    try:
+        proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                              text=True, timeout=args.timeout)
+        if os.path.exists(result_path):
+            with open(result_path) as f:
+                report.update(json.load(f))
+            os.remove(result_path)
+        else:
+            report.update(ok=False, error=f"Blender exited with {proc.returncode}: {proc.stderr[-2000:]}")
+    except subprocess.TimeoutExpired:
+        report.update(ok=False, error=f"Timed out after {args.timeout}s")
+    report["wall_s"] = time.perf_counter() - start
+    return report
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--pipeline", required=True)
+    parser.add_argument("--blender", default=os.environ.get("BLENDER", "blender"))
+    parser.add_argument("--output-dir", help="Save results here instead of overwriting the input files, "
+                                             "keeping their directories relative to each other")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--timeout", type=float, default=3600)
+    parser.add_argument("--report", default="bony_batch_report.json")
+    args = parser.parse_args(argv)
+    if len({os.path.abspath(p) for p in args.files}) != len(args.files):
+        parser.error("a file is listed more than once")
+
+    with open(args.pipeline) as f:
+        validate_pipeline(json.load(f))
+    args.pipeline = os.path.abspath(args.pipeline)
+    args.threads = max(1, (os.cpu_count() or 1) // args.jobs)
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+        args.input_root = os.path.commonpath([os.path.dirname(os.path.abspath(p)) for p in args.files])
+
+    start = time.perf_counter()
+    reports = []
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        for report in pool.map(lambda p: process_file(p, args), args.files):
+            print(f"{'ok    ' if report['ok'] else 'FAILED'} {report['wall_s']:8.2f}s  {report['file']}"
+                  + ("" if report["ok"] else f"\n       {report['error']}"))
+            reports.append(report)
+
+    failed = [r for r in reports if not r["ok"]]
+    summary = {"files": len(reports), "failed": len(failed),
+               "wall_s": time.perf_counter() - start, "jobs": args.jobs, "reports": reports}
+    with open(args.report, "w") as f:
+        json.dump(summary, f, indent=2)
+    print(f"{len(reports) - len(failed)}/{len(reports)} succeeded in {summary['wall_s']:.1f}s, report: {args.report}")
+    return 1 if failed else 0
+
+
+def worker_main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--worker", action="store_true")
+    parser.add_argument("--pipeline")
+    parser.add_argument("--output")
+    parser.add_argument("--result")
+    args = parser.parse_args(argv)
+
+    with open(args.pipeline) as f:
+        run_pipeline(json.load(f), args.output, args.result)
+
+
+if __name__ == "__main__":
+    if "--worker" in sys.argv:
+        worker_main(sys.argv[sys.argv.index("--") + 1:])
+    else:
+        sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,243 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTIBILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# Find bones nothing depends on (no weights, constraints, drivers or animation) and dissolve them
+
+import bpy
+import re
+from collections import namedtuple, defaultdict
+
+
+BONE_PATH = re.compile(r'pose\.bones\["(.+?)"\]')
+
+# Data blocks whose drivers may read bones
+DRIVER_COLLECTIONS = ("objects", "meshes", "shape_keys", "armatures", "materials")
+
+BoneReport = namedtuple("BoneReport", "armature meshes unused bones weight_entries removed_entries")
+
+
+def deformed_meshes(armature):
+    return [o for o in bpy.data.objects if o.type == 'MESH' and
+            any(m.type == 'ARMATURE' and m.object == armature for m in o.modifiers)]
+
+
+def read_entries(obj):
+    """Every weight entry of obj as parallel arrays: vertex index, group index, weight"""
+    import numpy as np
+
+    entries = [(v.index, g.group, g.weight) for v in obj.data.vertices for g in v.groups]
+    table = np.array(entries, dtype=np.float64).reshape(-1, 3)
+    return table[:, 0].astype(np.int64), table[:, 1].astype(np.int64), table[:, 2].astype(np.float32)
+
+
+def group_weights(obj):
+    """vertex group name -> (max weight, number of weight entries)"""
+    import numpy as np
+
+    names = [vg.name for vg in obj.vertex_groups]
+    _, groups, weights = read_entries(obj)
+    known = groups < len(names)
+    groups, weights = groups[known], weights[known]
+    entries = np.bincount(groups, minlength=len(names))
+    max_weights = np.zeros(len(names), dtype=np.float32)
+    np.maximum.at(max_weights, groups, weights)
+    return {name: (float(max_weights[i]), int(entries[i])) for i, name in enumerate(names)}
+
+
+def constraint_targets(armature):
+    """Names of bones used as subtargets by constraints and modifiers of any object"""
+    used = set()
+
+    def add(target, subtarget):
+        if target == armature and subtarget:
+            used.add(subtarget)
+
+    def add_constraints(constraints):
+        for c in constraints:
+            add(getattr(c, "target", None), getattr(c, "subtarget", None))
+            add(getattr(c, "pole_target", None), getattr(c, "pole_subtarget", None))
+            for t in getattr(c, "targets", ()):
+                add(t.target, t.subtarget)
+
+    for obj in bpy.data.objects:
+        add_constraints(obj.constraints)
+        if obj.pose:
+            for pb in obj.pose.bones:
+                add_constraints(pb.constraints)
+        for m in obj.modifiers:
+            add(getattr(m, "object", None), getattr(m, "subtarget", None))
+    return used
+
+
+def constraint_owners(armature):
+    """Names of bones with constraints of their own, and of every bone in an IK chain"""
+    used = set()
+    for pb in armature.pose.bones:
+        if len(pb.constraints) == 0:
+            continue
+        used.add(pb.name)
+        for c in pb.constraints:
+            if c.type != 'IK':
+                continue
+            # chain_count 0 means up to the root
+            bone = pb.parent
+            length = 1
+            while bone is not None and (c.chain_count == 0 or length < c.chain_count):
+                used.add(bone.name)
+                bone = bone.parent
+                length += 1
+    return used
+
+
+def driver_targets(armature):
+    """Names of bones read by driver variables or driven themselves"""
+    used = set()
+    for attr in DRIVER_COLLECTIONS:
+        for id in getattr(bpy.data, attr):
+            anim = id.animation_data
+            if anim is None:
+                continue
+            for fc in anim.drivers:
+                if id == armature:
+                    used.update(BONE_PATH.findall(fc.data_path))
+                for var in fc.driver.variables:
+                    for t in var.targets:
+                        if t.id != armature:
+                            continue
+                        if t.bone_target:
+                            used.add(t.bone_target)
+                        used.update(BONE_PATH.findall(t.data_path))
+    return used
+
+
+def string_props(struct, prefix):
+    return [getattr(struct, p.identifier) for p in struct.bl_rna.properties
+            if p.type == 'STRING' and p.identifier.startswith(prefix)]
+
+
+def vertex_group_users(meshes):
+    """Names of vertex groups read by shape keys or modifiers of meshes (Mask, DataTransfer,
+    Smooth, cloth pinning...). Removing such a group would change what they do."""
+    used = set()
+    for obj in meshes:
+        if obj.data.shape_keys:
+            used.update(kb.vertex_group for kb in obj.data.shape_keys.key_blocks)
+        for m in obj.modifiers:
+            used.update(string_props(m, "vertex_group"))
+            # Cloth and soft body keep theirs in their settings
+            settings = getattr(m, "settings", None)
+            if settings is not None:
+                used.update(string_props(settings, "vertex_group"))
+    used.discard("")
+    return used
+
+
+def animated_bones():
+    # Every action, not only the assigned ones: stashed and library actions count too
+    used = set()
+    for action in bpy.data.actions:
+        for fc in action.fcurves:
+            used.update(BONE_PATH.findall(fc.data_path))
+    return used
+
+
+def analyze(armature, min_weight):
+    meshes = deformed_meshes(armature)
+    weights = [group_weights(o) for o in meshes]
+    used = (constraint_targets(armature) | constraint_owners(armature)
+            | driver_targets(armature) | animated_bones() | vertex_group_users(meshes))
+
+    unused = []
+    for bone in armature.data.bones:
+        if bone.name in used:
+            continue
+        # Visible controls are for animators, even if nothing animates them yet
+        if armature.pose.bones[bone.name].custom_shape is not None:
+            continue
+        if any(w.get(bone.name, (0.0, 0))[0] >= min_weight for w in weights):
+            continue
+        unused.append(bone.name)
+
+    unused_set = set(unused)
+    weight_entries = sum(n for w in weights for _, n in w.values())
+    removed_entries = sum(n for w in weights for name, (_, n) in w.items() if name in unused_set)
+    return BoneReport(armature, meshes, unused, len(armature.data.bones), weight_entries, removed_entries)
+
+
+def kept_parent(bones, name, unused):
+    parent = bones[name].parent
+    while parent is not None and parent.name in unused:
+        parent = parent.parent
+    return parent
+
+
+def merge_weights(obj, unused, parents):
+    """Add what's left in the groups of unused bones to their parent's group, then remove them"""
+    import numpy as np
+    from .mirror import write_weights
+
+    groups = {vg.index: vg for vg in obj.vertex_groups if vg.name in unused}
+    if not groups:
+        return
+    verts, group_ids, weights = read_entries(obj)
+
+    # Several unused bones can share a kept parent, add all of them up at once
+    by_parent = defaultdict(list)
+    for index, vg in groups.items():
+        if parents.get(vg.name) is not None:
+            by_parent[parents[vg.name]].append(index)
+
+    for parent, indices in by_parent.items():
+        leftover = np.isin(group_ids, indices) & (weights > 0)
+        if not leftover.any():
+            continue
+        target = obj.vertex_groups.get(parent) or obj.vertex_groups.new(name=parent)
+        total = np.zeros(len(obj.data.vertices), dtype=np.float32)
+        existing = group_ids == target.index
+        total[verts[existing]] = weights[existing]
+        np.add.at(total, verts[leftover], weights[leftover])
+        touched = np.unique(verts[leftover])
+        write_weights(target, touched, np.minimum(total[touched], 1.0))
+
+    for vg in groups.values():
+        obj.vertex_groups.remove(vg)
+
+
+def dissolve(reports):
+    """Remove the unused bones of every report. The armatures must be selected,
+    the active one among them, in object mode."""
+    unused = {}
+    parents = {}
+    for r in reports:
+        bones = r.armature.data.bones
+        unused[r.armature] = set(r.unused)
+        parents[r.armature] = {}
+        for name in r.unused:
+            parent = kept_parent(bones, name, unused[r.armature])
+            parents[r.armature][name] = parent.name if parent else None
+        for obj in r.meshes:
+            merge_weights(obj, unused[r.armature], parents[r.armature])
+
+    # One trip to edit mode for all the armatures
+    bpy.ops.object.mode_set(mode='EDIT')
+    for r in reports:
+        edit_bones = r.armature.data.edit_bones
+        for eb in edit_bones:
+            if eb.name in unused[r.armature] or eb.parent is None or eb.parent.name not in unused[r.armature]:
+                continue
+            parent = parents[r.armature][eb.parent.name]
+            eb.use_connect = False
+            eb.parent = edit_bones[parent] if parent else None
+        for name in r.unused:
+            edit_bones.remove(edit_bones[name])
+    bpy.ops.object.mode_set(mode='OBJECT')
@@ -0,0 +1,55 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTIBILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# Work on many objects at once: gather their data, compute on it in a thread pool
+# and write the results back, without making each object active in turn.
+
+import os
+import bpy
+from concurrent.futures import ThreadPoolExecutor
+
+from .instrument import stage
+
+
+def chunks(objs, size=None):
+    """objs split into lists of at most size (one per worker by default)"""
+    size = size or os.cpu_count() or 1
+    return [objs[i:i + size] for i in range(0, len(objs), size)]
+
+
+def map_objects(objs, gather, compute, workers=None):
+    """Run gather(obj) on the main thread, then compute(data) on what it returned in a
+    thread pool, one chunk of objects at a time. compute must not touch Blender data, only
+    plain Python and numpy values (numpy releases the GIL on large arrays).
+    Yields (obj, result) pairs; write each result back on the main thread before taking
+    the next, so only one chunk's data is alive at a time. Update the view layer once afterwards.
+    """
+    workers = workers or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for chunk in chunks(objs, workers):
+            with stage("gather"):
+                data = [gather(obj) for obj in chunk]
+            with stage("compute"):
+                results = list(pool.map(compute, data)) if len(data) > 1 else [compute(d) for d in data]
+            del data
+            yield from zip(chunk, results)
+            results = None
+
+
+def run_on(obj, op, **kwargs):
+    """Run operator op (e.g. bpy.ops.object.modifier_apply) on obj instead of the active object"""
+    if hasattr(bpy.context, "temp_override"):
+        with bpy.context.temp_override(object=obj, active_object=obj):
+            return op(**kwargs)
+    # Before Blender 3.2. Blender 4.0 no longer takes the override as an argument.
+    return op({'object': obj, 'active_object': obj}, **kwargs)
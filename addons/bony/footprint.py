@@ -0,0 +1,217 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTIBILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Approximate memory footprint of a scene, per data block and per object.
+
+Also runs headless:
+
+    blender --background scene.blend --python bony/footprint.py -- --output memory.json
+
+Sizes are estimates from element counts, good for ranking, not for accounting.
+"""
+
+import bpy
+import sys
+import json
+import argparse
+from collections import namedtuple, defaultdict
+
+
+# Rough bytes per element
+MESH_VERTEX = 16
+MESH_EDGE = 8
+MESH_LOOP = 8
+MESH_FACE = 12
+SHAPE_KEY_VERTEX = 12
+DEFORM_VERTEX = 16
+WEIGHT_ENTRY = 8
+BONE = 600
+KEYFRAME = 72
+FCURVE = 200
+DRIVER = 400
+DRIVER_VARIABLE = 200
+GP_POINT = 48
+
+# Operators shrinking each category
+FIXES = {
+    "shape_keys": "bony.merge_non_corrective_shape_keys",
+    "shape_key_drivers": "bony.merge_non_corrective_shape_keys",
+    "vertex_groups": "bony.dissolve_unused_bones",
+    "bones": "bony.dissolve_unused_bones",
+    "evaluated": "bony.optimize_modifier_stacks",
+    "annotations": "annotator.compact_layers",
+}
+
+# datablock is "Type:name", owners the objects (or scenes) using it
+Entry = namedtuple("Entry", "datablock category owners bytes detail")
+
+
+def datablock_name(id):
+    return f"{type(id).__name__}:{id.name}"
+
+
+def mesh_bytes(mesh):
+    return (len(mesh.vertices) * MESH_VERTEX + len(mesh.edges) * MESH_EDGE
+            + len(mesh.loops) * MESH_LOOP + len(mesh.polygons) * MESH_FACE)
+
+
+def users_of(objects):
+    users = defaultdict(list)
+    for obj in objects:
+        if obj.data is not None:
+            users[obj.data].append(obj.name)
+    return users
+
+
+def mesh_entries(mesh, owners):
+    name = datablock_name(mesh)
+    n = len(mesh.vertices)
+    yield Entry(name, "mesh", owners, mesh_bytes(mesh), f"{n} vertices")
+
+    if mesh.shape_keys:
+        keys = len(mesh.shape_keys.key_blocks)
+        yield Entry(name, "shape_keys", owners, keys * n * SHAPE_KEY_VERTEX, f"{keys} keys x {n} vertices")
+
+    weights = sum(len(v.groups) for v in mesh.vertices)
+    if weights:
+        yield Entry(name, "vertex_groups", owners, n * DEFORM_VERTEX + weights * WEIGHT_ENTRY,
+                    f"{weights} weight entries")
+
+
+def evaluated_entries(objects, depsgraph):
+    """Meshes kept by modifier evaluation, one per object with an enabled stack"""
+    for obj in objects:
+        if obj.type != 'MESH' or not any(m.show_viewport for m in obj.modifiers):
+            continue
+        evaluated_obj = obj.evaluated_get(depsgraph)
+        mesh = evaluated_obj.to_mesh()
+        try:
+            size = mesh_bytes(mesh)
+            detail = f"{len(mesh.vertices)} vertices after {len(obj.modifiers)} modifier(s)"
+        finally:
+            evaluated_obj.to_mesh_clear()
+        yield Entry(datablock_name(obj), "evaluated", [obj.name], size, detail)
+
+
+def animation_entries(ids, users):
+    """Actions and drivers of ids (objects, shape keys, ...), charged to the objects using them"""
+    action_owners = defaultdict(list)
+    for id in ids:
+        anim = id.animation_data
+        if anim is None:
+            continue
+        owners = users.get(id, [id.name])
+        if anim.action:
+            action_owners[anim.action].extend(owners)
+        if len(anim.drivers):
+            variables = sum(len(fc.driver.variables) for fc in anim.drivers)
+            category = "shape_key_drivers" if isinstance(id, bpy.types.Key) else "drivers"
+            yield Entry(datablock_name(id), category, owners,
+                        len(anim.drivers) * DRIVER + variables * DRIVER_VARIABLE,
+                        f"{len(anim.drivers)} drivers, {variables} variables")
+
+    for action, owners in action_owners.items():
+        keyframes = sum(len(fc.keyframe_points) for fc in action.fcurves)
+        yield Entry(datablock_name(action), "actions", owners,
+                    len(action.fcurves) * FCURVE + keyframes * KEYFRAME,
+                    f"{len(action.fcurves)} fcurves, {keyframes} keyframes")
+
+
+def grease_pencil_entries(gp, owners):
+    points = sum(len(s.points) for layer in gp.layers for frame in layer.frames for s in frame.strokes)
+    if points:
+        yield Entry(datablock_name(gp), "annotations", owners, points * GP_POINT, f"{points} points")
+
+
+def collect(context):
+    """All entries of the file, largest first"""
+    objects = list(context.scene.objects)
+    users = users_of(objects)
+    # Shape keys belong to their mesh's objects
+    for mesh in list(users):
+        if isinstance(mesh, bpy.types.Mesh) and mesh.shape_keys:
+            users[mesh.shape_keys] = users[mesh]
+
+    entries = []
+    for data, owners in users.items():
+        if isinstance(data, bpy.types.Mesh):
+            entries.extend(mesh_entries(data, owners))
+        elif isinstance(data, bpy.types.Armature):
+            entries.append(Entry(datablock_name(data), "bones", owners, len(data.bones) * BONE,
+                                 f"{len(data.bones)} bones"))
+        elif isinstance(data, bpy.types.GreasePencil):
+            entries.extend(grease_pencil_entries(data, owners))
+
+    for scene in bpy.data.scenes:
+        if scene.grease_pencil:
+            entries.extend(grease_pencil_entries(scene.grease_pencil, [scene.name]))
+
+    entries.extend(evaluated_entries(objects, context.evaluated_depsgraph_get()))
+    entries.extend(animation_entries(objects + [k for k in users if isinstance(k, bpy.types.Key)], users))
+    entries.sort(key=lambda e: e.bytes, reverse=True)
+    return entries
+
+
+def per_object(entries):
+    """object name -> category -> bytes. Shared data blocks count for every user."""
+    objects = defaultdict(lambda: defaultdict(int))
+    for e in entries:
+        for owner in e.owners:
+            objects[owner][e.category] += e.bytes
+    return objects
+
+
+def to_json(entries):
+    return {
+        "total_bytes": sum(e.bytes for e in entries),
+        "datablocks": [dict(e._asdict(), fix=FIXES.get(e.category)) for e in entries],
+        "objects": dict(sorted(((name, dict(c, total=sum(c.values()))) for name, c in per_object(entries).items()),
+                               key=lambda item: item[1]["total"], reverse=True)),
+    }
+
+
+def write_report(entries, path):
+    with open(path, "w") as f:
+        json.dump(to_json(entries), f, indent=2)
+
+
+def format_bytes(size):
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def print_report(entries, limit=20):
+    print(f"Estimated total: {format_bytes(sum(e.bytes for e in entries))}")
+    for e in entries[:limit]:
+        fix = FIXES.get(e.category)
+        print(f"{format_bytes(e.bytes):>10}  {e.category:<18} {e.datablock} ({e.detail})"
+              + (f"  -> {fix}" if fix else ""))
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default="bony_memory.json")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    entries = collect(bpy.context)
+    print_report(entries, args.limit)
+    write_report(entries, args.output)
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else [])
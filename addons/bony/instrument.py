@@ -0,0 +1,246 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTIBILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# Timing of operators and their internal stages, shared by all the addons:
+#   from bony import instrument
+#   instrument.instrument_operators(CLASSES_TO_REGISTER)
+#   with instrument.stage("kd_tree_build"): ...
+#
+# Bony is optional for the other addons: they import it in a try block and skip the timing
+# when it's missing. Every addon keeps the seconds it spent importing and registering in a
+# module-level STARTUP_TIMES dict for the startup report. Anything needing numpy, or only
+# used by one operator, is imported on first use (see LAZY_MODULES) to keep startup short.
+
+import bpy
+import os
+import sys
+import json
+import time
+import functools
+from collections import deque
+
+
+MAX_EVENTS = 512
+MODE_SWITCH_OPS = {"OBJECT_OT_mode_set", "OBJECT_OT_editmode_toggle", "OBJECT_OT_posemode_toggle"}
+
+# Finished spans, oldest first. Children finish (and so appear) before their parents.
+events = deque(maxlen=MAX_EVENTS)
+_open_spans = []
+_ops_call = None
+
+
+class Span:
+    def __init__(self, name, category):
+        self.name = name
+        self.category = category
+        self.depth = len(_open_spans)
+        self.ops_calls = 0
+        self.mode_switches = 0
+        self.start = 0.0
+        self.duration = 0.0
+
+    def __enter__(self):
+        _install_ops_hook()
+        _open_spans.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.duration = time.perf_counter() - self.start
+        _open_spans.remove(self)
+        events.append(self)
+
+
+def stage(name):
+    """Time a named stage inside an operator"""
+    return Span(name, "stage")
+
+
+def _install_ops_hook():
+    global _ops_call
+    if _ops_call is not None:
+        return
+
+    op_class = type(bpy.ops.object.mode_set)
+    _ops_call = op_class.__call__
+
+    def call(op, *args, **kwargs):
+        if _open_spans:
+            is_mode_switch = op.idname() in MODE_SWITCH_OPS
+            for span in _open_spans:
+                span.ops_calls += 1
+                span.mode_switches += is_mode_switch
+        return _ops_call(op, *args, **kwargs)
+
+    op_class.__call__ = call
+
+
+def disable():
+    global _ops_call
+    if _ops_call is not None:
+        type(bpy.ops.object.mode_set).__call__ = _ops_call
+        _ops_call = None
+
+
+def timed_execute(execute, name):
+    # register_class() wants execute to take exactly (self, context)
+    def wrapper(self, context):
+        with Span(name, "operator"):
+            return execute(self, context)
+
+    functools.update_wrapper(wrapper, execute)
+    wrapper._instrumented = True
+    return wrapper
+
+
+def instrument_operators(classes):
+    """Time execute() of every operator in classes. Call before registering them."""
+    for klass in classes:
+        if not issubclass(klass, bpy.types.Operator) or not hasattr(klass, "execute"):
+            continue
+        if getattr(klass.execute, "_instrumented", False):
+            continue
+        klass.execute = timed_execute(klass.execute, klass.bl_idname)
+
+
+def clear():
+    events.clear()
+
+
+def write_trace(path):
+    """Write the events in Chrome's trace event format (chrome://tracing, Perfetto)"""
+    if not events:
+        return
+    origin = min(e.start for e in events)
+    trace = [{
+        "name": e.name,
+        "cat": e.category,
+        "ph": "X",
+        "ts": (e.start - origin) * 1e6,
+        "dur": e.duration * 1e6,
+        "pid": os.getpid(),
+        "tid": 0,
+        "args": {"ops_calls": e.ops_calls, "mode_switches": e.mode_switches},
+    } for e in events]
+    with open(path, "w") as f:
+        json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
+
+
+ADDONS = ("bony", "scrubby", "annotator")
+# They shouldn't show up as loaded right after startup
+LAZY_MODULES = ("numpy", "bony.mirror", "bony.shape_keys", "bony.bulk", "bony.bone_usage",
+                "bony.modifier_stack", "bony.footprint", "scrubby.point_cache", "annotator.strokes")
+
+
+def startup_report():
+    """[(addon, import seconds, register seconds)], [(lazy module, loaded)]"""
+    times = []
+    for name in ADDONS:
+        module = sys.modules.get(name)
+        startup = getattr(module, "STARTUP_TIMES", None)
+        if startup is not None:
+            times.append((name, startup.get("import"), startup.get("register")))
+    return times, [(name, name in sys.modules) for name in LAZY_MODULES]
+
+
+def format_seconds(seconds):
+    return "-" if seconds is None else f"{seconds * 1000:.1f} ms"
+
+
+class StartupReport(bpy.types.Operator):
+    bl_idname = "bony.startup_report"
+    bl_label = "Startup Report"
+    bl_description = """Print how long each addon took to import and register"""
+    bl_options = {'REGISTER'}
+
+    def execute(self, context):
+        times, lazy = startup_report()
+        for name, imported, registered in times:
+            line = f"{name}: import {format_seconds(imported)}, register {format_seconds(registered)}"
+            print(line)
+            self.report({'INFO'}, line)
+        for name, loaded in lazy:
+            print(f"{name}: {'loaded' if loaded else 'not loaded'}")
+        return {'FINISHED'}
+
+
+class ClearTimings(bpy.types.Operator):
+    bl_idname = "bony.clear_timings"
+    bl_label = "Clear Timings"
+    bl_description = """Forget all recorded timings"""
+    bl_options = {'REGISTER'}
+
+    def execute(self, context):
+        clear()
+        return {'FINISHED'}
+
+
+class SaveTrace(bpy.types.Operator):
+    bl_idname = "bony.save_trace"
+    bl_label = "Save Trace"
+    bl_description = """Write recorded timings to a trace file (open it in chrome://tracing or Perfetto)"""
+    bl_options = {'REGISTER'}
+
+    @classmethod
+    def poll(cls, context):
+        return len(events) > 0 and context.scene.bony_settings.trace_path
+
+
+    def execute(self, context):
+        path = bpy.path.abspath(context.scene.bony_settings.trace_path)
+        write_trace(path)
+        self.report({'INFO'}, f"Trace written to {path}")
+        return {'FINISHED'}
+
+
+class Bony_PT_Timing(bpy.types.Panel):
+    bl_idname = "BONY_PT_TIMING"
+    bl_label = "Timing"
+    bl_space_type = "VIEW_3D"
+    bl_region_type = "UI"
+    bl_category = "Bony"
+    bl_parent_id = "BONY_PT_OBJECT"
+    bl_options = {'DEFAULT_CLOSED'}
+
+    MAX_ROWS = 30
+
+    def draw(self, context):
+        layout = self.layout
+        settings = context.scene.bony_settings
+
+        row = layout.row(align=True)
+        row.operator(ClearTimings.bl_idname, icon="X")
+        row.operator(SaveTrace.bl_idname, icon="EXPORT")
+        layout.prop(settings, "trace_path", text="")
+
+        times, _ = startup_report()
+        col = layout.column(align=True)
+        for name, imported, registered in times:
+            row = col.row()
+            row.label(text=name)
+            row.label(text=f"import {format_seconds(imported)}  register {format_seconds(registered)}")
+        layout.operator(StartupReport.bl_idname, icon="TIME")
+
+        col = layout.column(align=True)
+        for e in list(reversed(events))[:self.MAX_ROWS]:
+            row = col.row()
+            row.label(text=("    " * e.depth) + e.name)
+            row.label(text=f"{e.duration * 1000:.1f} ms  ops {e.ops_calls}  modes {e.mode_switches}")
+
+
+CLASSES_TO_REGISTER = [
+    StartupReport,
+    ClearTimings,
+    SaveTrace,
+    Bony_PT_Timing,
+]
@@ -0,0 +1,143 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTIBILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# Run long operators as modal, timer driven jobs that can be cancelled with Esc
+
+import bpy
+import time
+
+from .instrument import stage
+
+
+class ChunkedJob:
+    """Operator mixin. Subclasses implement job_prepare(context), returning a list of
+    (object, step) pairs (or None to cancel), and optionally job_finish(context).
+    The object is made active before its step runs, pass None if the step doesn't need that.
+
+    invoke() runs the steps in chunks bounded by the scene's time budget, showing progress
+    in the status bar, and rolls everything back on Esc. execute() runs them all at once,
+    for scripts, redo and background Blender.
+
+    Rolling back goes through undo, which frees and reloads every ID: keep names, not
+    objects, on self between steps (e.g. for job_finish), only the steps may hold objects.
+    """
+    job_stage_name = "steps"
+
+    def job_finish(self, context):
+        pass
+
+
+    def run_step(self, context, obj, step):
+        # Steps calling bpy.ops work on the active object
+        if obj is not None and context.view_layer.objects.active != obj:
+            context.view_layer.objects.active = obj
+        step()
+
+
+    def execute(self, context):
+        steps = self.job_prepare(context)
+        if steps is None:
+            return {'CANCELLED'}
+        with stage(self.job_stage_name):
+            for obj, step in steps:
+                self.run_step(context, obj, step)
+        self.job_finish(context)
+        return {'FINISHED'}
+
+
+    def invoke(self, context, event):
+        self._can_rollback = undo_available(context)
+        if self._can_rollback:
+            bpy.ops.ed.undo_push(message=f"Before {self.bl_label}")
+        steps = self.job_prepare(context)
+        if steps is None:
+            return {'CANCELLED'}
+
+        self._steps = steps
+        self._done = 0
+        self._budget = context.scene.bony_settings.job_time_budget / 1000
+
+        wm = context.window_manager
+        wm.progress_begin(0, max(1, len(steps)))
+        self._timer = wm.event_timer_add(0.01, window=context.window)
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+
+    def modal(self, context, event):
+        if event.type == 'ESC' and event.value == 'PRESS':
+            self.job_end(context)
+            self.rollback(context)
+            self.report({'WARNING'}, f"{self.bl_label} cancelled")
+            return {'CANCELLED'}
+        if event.type != 'TIMER':
+            # Keep the data from changing under us, the UI still redraws
+            return {'RUNNING_MODAL'}
+
+        deadline = time.perf_counter() + self._budget
+        error = None
+        with stage(self.bl_idname):
+            while self._done < len(self._steps):
+                obj, step = self._steps[self._done]
+                try:
+                    self.run_step(context, obj, step)
+                except Exception as e:
+                    error = e
+                    break
+                self._done += 1
+                if time.perf_counter() >= deadline:
+                    break
+            obj = step = None
+
+        if error is not None:
+            self.job_end(context)
+            self.rollback(context)
+            self.report({'ERROR'}, f"{self.bl_label} failed: {error}")
+            return {'CANCELLED'}
+
+        context.window_manager.progress_update(self._done)
+        context.workspace.status_text_set(
+            f"{self.bl_label}: {self._done}/{len(self._steps)} (Esc to cancel)")
+        if self._done < len(self._steps):
+            return {'RUNNING_MODAL'}
+
+        self.job_end(context)
+        self.job_finish(context)
+        return {'FINISHED'}
+
+
+    def job_end(self, context):
+        wm = context.window_manager
+        wm.event_timer_remove(self._timer)
+        wm.progress_end()
+        context.workspace.status_text_set(None)
+
+
+    def rollback(self, context):
+        # The steps hold objects, which undo is about to free
+        done = self._done
+        self._steps = None
+        if not self._can_rollback:
+            self.report({'WARNING'}, f"Undo is disabled, {self.bl_label} can't be rolled back "
+                                     f"({done} step(s) were applied)")
+            return
+        if context.mode != 'OBJECT':
+            bpy.ops.object.mode_set(mode='OBJECT')
+        # Make the partial result an undo step, then step back to the one pushed in invoke()
+        bpy.ops.ed.undo_push(message=f"{self.bl_label} (cancelled)")
+        bpy.ops.ed.undo()
+
+
+def undo_available(context):
+    edit = context.preferences.edit
+    return edit.use_global_undo and edit.undo_steps > 0
@@ -0,0 +1,128 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTIBILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# Vertex arrays of (evaluated) meshes shared by Bony operators, so a pipeline
+# evaluates each mesh once. Entries are keyed by an update stamp bumped from
+# depsgraph_update_post, so anything that re-evaluates the object invalidates them.
+
+import bpy
+from collections import OrderedDict, defaultdict
+from bpy.app.handlers import persistent
+
+
+DEFAULT_BUDGET_MB = 512
+
+# object pointer -> number of depsgraph updates seen for it
+_stamps = defaultdict(int)
+# (object pointer, stamp, frame, evaluated, world, vertex count, mode) -> vertex array,
+# least recently used first
+_entries = OrderedDict()
+
+
+def _budget_bytes():
+    settings = getattr(bpy.context.scene, "bony_settings", None)
+    budget = settings.mesh_cache_budget_mb if settings else DEFAULT_BUDGET_MB
+    return budget * 1024 * 1024
+
+
+def _evict(budget):
+    size = sum(a.nbytes for a in _entries.values())
+    while _entries and size > budget:
+        _, array = _entries.popitem(last=False)
+        size -= array.nbytes
+
+
+def _read_co(mesh, matrix):
+    # Imported here so registering the handlers doesn't load numpy at startup
+    import numpy as np
+
+    co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", co)
+    co = co.reshape(-1, 3)
+    if matrix is not None:
+        m = np.array(matrix, dtype=np.float32)
+        co = co @ m[:3, :3].T + m[:3, 3]
+    return co
+
+
+def vertices(obj, evaluated=True, world=True, depsgraph=None):
+    """(n, 3) float32 array of obj's vertex positions. Treat it as read-only, it's shared."""
+    if evaluated:
+        # Make sure pending updates have run (and bumped the stamp) before looking up.
+        # Raw data doesn't need an evaluation, writers of it invalidate the cache.
+        depsgraph = depsgraph or bpy.context.evaluated_depsgraph_get()
+    ptr = obj.as_pointer()
+    key = (ptr, _stamps[ptr], bpy.context.scene.frame_current, evaluated, world,
+           len(obj.data.vertices), obj.mode)
+
+    co = _entries.get(key)
+    if co is not None:
+        _entries.move_to_end(key)
+        return co
+
+    matrix = obj.matrix_world if world else None
+    if evaluated:
+        evaluated_obj = obj.evaluated_get(depsgraph)
+        mesh = evaluated_obj.to_mesh()
+        try:
+            co = _read_co(mesh, matrix)
+        finally:
+            evaluated_obj.to_mesh_clear()
+    else:
+        co = _read_co(obj.data, matrix)
+
+    co.flags.writeable = False
+    _entries[key] = co
+    _evict(_budget_bytes())
+    return co
+
+
+def invalidate(obj=None):
+    """Drop cached arrays of obj, or of everything"""
+    if obj is None:
+        _entries.clear()
+        return
+    ptr = obj.as_pointer()
+    for key in [key for key in _entries if key[0] == ptr]:
+        del _entries[key]
+
+
+def memory_used():
+    return sum(a.nbytes for a in _entries.values())
+
+
+@persistent
+def on_depsgraph_update(scene, depsgraph):
+    for update in depsgraph.updates:
+        if isinstance(update.id, bpy.types.Object) and (update.is_updated_geometry or
+                                                        update.is_updated_transform):
+            _stamps[update.id.original.as_pointer()] += 1
+
+
+@persistent
+def on_load_post(*args):
+    _stamps.clear()
+    _entries.clear()
+
+
+def register():
+    bpy.app.handlers.depsgraph_update_post.append(on_depsgraph_update)
+    bpy.app.handlers.load_post.append(on_load_post)
+
+
+def unregister():
+    for handlers, handler in ((bpy.app.handlers.depsgraph_update_post, on_depsgraph_update),
+                              (bpy.app.handlers.load_post, on_load_post)):
+        if handler in handlers:
+            handlers.remove(handler)
+    on_load_post()
@@ -0,0 +1,160 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTIBILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# Mirror vertex group weights and shape keys across X with a vertex correspondence map
+
+import bpy
+import numpy as np
+from mathutils.kdtree import KDTree
+
+from . import mesh_cache
+
+
+FLIP_X = np.array([-1, 1, 1], dtype=np.float32)
+
+# (topology key, tolerance) -> index of the mirrored vertex of every vertex, -1 if it has none.
+# Meshes sharing a topology (e.g. the same Daz figure with different morphs) share a map.
+_maps = {}
+
+
+def topology_key(mesh):
+    edges = np.empty(len(mesh.edges) * 2, dtype=np.int32)
+    mesh.edges.foreach_get("vertices", edges)
+    return (len(mesh.vertices), len(mesh.edges), len(mesh.polygons), hash(edges.tobytes()))
+
+
+def build_map(co, tolerance):
+    n = len(co)
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+    flipped = co * FLIP_X
+    # Vertices and flipped vertices landing in the same grid cell are pairs
+    cells = np.round(np.concatenate([co, flipped]) / tolerance).astype(np.int64)
+    _, ids = np.unique(cells, axis=0, return_inverse=True)
+    ids = ids.reshape(-1)
+    owner = np.full(ids.max() + 1, -1, dtype=np.int64)
+    owner[ids[:n]] = np.arange(n)
+    mirror = owner[ids[n:]]
+
+    found = mirror >= 0
+    too_far = np.linalg.norm(co[mirror[found]] - flipped[found], axis=1) > tolerance
+    mirror[np.flatnonzero(found)[too_far]] = -1
+
+    # A pair can straddle a cell border, look the rest up one by one
+    missing = np.flatnonzero(mirror < 0)
+    if len(missing):
+        kd = KDTree(n)
+        for i, c in enumerate(co):
+            kd.insert(c, i)
+        kd.balance()
+        for i in missing:
+            _, j, dist = kd.find(flipped[i])
+            if j is not None and dist <= tolerance:
+                mirror[i] = j
+    return mirror
+
+
+def mirror_map(obj, tolerance):
+    key = (topology_key(obj.data), tolerance)
+    mirror = _maps.get(key)
+    if mirror is None:
+        co = mesh_cache.vertices(obj, evaluated=False, world=False)
+        mirror = _maps[key] = build_map(co, tolerance)
+    return mirror
+
+
+def read_weights(obj, names):
+    """(n, len(names)) weights of the named groups, and which of them are assigned"""
+    columns = {obj.vertex_groups[name].index: col for col, name in enumerate(names)}
+    n = len(obj.data.vertices)
+    weights = np.zeros((n, len(names)), dtype=np.float32)
+    assigned = np.zeros((n, len(names)), dtype=bool)
+    for v in obj.data.vertices:
+        for g in v.groups:
+            col = columns.get(g.group)
+            if col is not None:
+                weights[v.index, col] = g.weight
+                assigned[v.index, col] = True
+    return weights, assigned
+
+
+def write_weights(vg, indices, weights):
+    # One add() per distinct weight instead of one per vertex
+    values, inverse = np.unique(weights, return_inverse=True)
+    order = np.argsort(inverse, kind='stable')
+    splits = np.flatnonzero(np.diff(inverse[order])) + 1
+    for value, group in zip(values, np.split(indices[order], splits)):
+        vg.add(group.tolist(), float(value), 'REPLACE')
+
+
+def mirror_vertex_groups(obj, mirror, rename):
+    """Replace the weights of every group rename() gives a name for with the mirrored ones.
+    Vertices without a mirror keep their weights. Returns the number of groups written."""
+    pairs = [(vg.name, rename(vg.name)) for vg in obj.vertex_groups]
+    pairs = [(left, right) for left, right in pairs if right]
+    if not pairs:
+        return 0
+
+    weights, assigned = read_weights(obj, [left for left, _ in pairs])
+    targets = np.flatnonzero(mirror >= 0)
+    weights = weights[mirror[targets]]
+    assigned = assigned[mirror[targets]]
+
+    target_list = targets.tolist()
+    for col, (_, right) in enumerate(pairs):
+        vg = obj.vertex_groups.get(right) or obj.vertex_groups.new(name=right)
+        vg.remove(target_list)
+        has_weight = assigned[:, col]
+        write_weights(vg, targets[has_weight], weights[has_weight, col])
+    return len(pairs)
+
+
+def read_co(key_block):
+    co = np.empty(len(key_block.data) * 3, dtype=np.float32)
+    key_block.data.foreach_get("co", co)
+    return co.reshape(-1, 3)
+
+
+def mirror_shape_keys(obj, mirror, rename):
+    """Write the mirrored deltas of every shape key rename() gives a name for into that key,
+    creating it if needed. Returns the number of keys written."""
+    if obj.data.shape_keys is None:
+        return 0
+    key_blocks = obj.data.shape_keys.key_blocks
+    pairs = [(kb.name, rename(kb.name)) for kb in key_blocks]
+    pairs = [(left, right) for left, right in pairs if right]
+
+    targets = np.flatnonzero(mirror >= 0)
+    sources = mirror[targets]
+    for left, right in pairs:
+        kb = key_blocks[left]
+        relative = read_co(kb.relative_key)
+        delta = read_co(kb) - relative
+
+        rk = key_blocks.get(right)
+        if rk is None:
+            rk = obj.shape_key_add(name=right, from_mix=False)
+            co = relative.copy()
+        else:
+            co = read_co(rk)
+        co[targets] = relative[targets] + delta[sources] * FLIP_X
+
+        rk.data.foreach_set("co", co.ravel())
+        rk.relative_key = kb.relative_key
+        rk.slider_min = kb.slider_min
+        rk.slider_max = kb.slider_max
+        rk.vertex_group = rename(kb.vertex_group) or kb.vertex_group
+
+    obj.data.update()
+    mesh_cache.invalidate(obj)
+    return len(pairs)
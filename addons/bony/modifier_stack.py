@@ -0,0 +1,228 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTIBILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# Score modifier stacks against ordering and cost rules, and fix them
+
+import bpy
+import re
+import json
+from collections import namedtuple
+
+
+# Stages of a stack, in order. Modifiers of other types stay right after
+# whatever they follow now, but never after the last stage: subdivision
+# multiplies the vertices everything below it has to work on.
+STACK_ORDER = [
+    {'MIRROR'},
+    {'ARMATURE'},
+    {'CORRECTIVE_SMOOTH'},
+    {'SOLIDIFY'},
+    {'SUBSURF', 'MULTIRES'},
+]
+
+# type -> (relative cost per input vertex, vertex count multiplier)
+COST_RULES = {
+    'ARMATURE': (1.0, 1),
+    'CORRECTIVE_SMOOTH': (2.0, 1),
+    'DATA_TRANSFER': (4.0, 1),
+    'MIRROR': (0.5, 2),
+    'SOLIDIFY': (1.0, 2),
+    'SUBSURF': (2.0, None),
+    'MULTIRES': (2.0, None),
+    'SHRINKWRAP': (3.0, 1),
+    'SURFACE_DEFORM': (2.0, 1),
+    'MESH_DEFORM': (4.0, 1),
+}
+DEFAULT_COST = (1.0, 1)
+
+# Ordering and cost rules to judge stacks by, see scene_rules() for setting them per scene
+StackRules = namedtuple("StackRules", "order costs")
+DEFAULT_RULES = StackRules(STACK_ORDER, COST_RULES)
+
+# Modifiers doing nothing without a target
+REQUIRED_TARGETS = {
+    'ARMATURE': 'object',
+    'CURVE': 'object',
+    'DATA_TRANSFER': 'object',
+    'HOOK': 'object',
+    'LATTICE': 'object',
+    'MESH_DEFORM': 'object',
+    'SHRINKWRAP': 'target',
+    'SURFACE_DEFORM': 'target',
+}
+
+# Modifiers doing nothing when this value is zero. Not Solidify: a zero thickness
+# shell (and its rim) is still extra geometry.
+ZERO_NOOPS = {
+    'CORRECTIVE_SMOOTH': 'factor',
+    'DISPLACE': 'strength',
+    'SMOOTH': 'factor',
+}
+
+Issue = namedtuple("Issue", "modifier kind message")
+StackReport = namedtuple("StackReport", "obj cost optimized_cost issues")
+
+
+def modifier_types():
+    return {item.identifier for item in bpy.types.Modifier.bl_rna.properties['type'].enum_items}
+
+
+def parse_stack_order(text):
+    """Stages from text like "MIRROR; ARMATURE; SUBSURF MULTIRES": stages separated by
+    semicolons, the modifier types of a stage by spaces or commas"""
+    stages = [set(re.split(r"[\s,]+", part.strip().upper())) - {""} for part in text.split(";")]
+    stages = [types for types in stages if types]
+    unknown = set().union(*stages) - modifier_types()
+    if unknown:
+        raise ValueError(f"Unknown modifier type(s) in the stack order: {', '.join(sorted(unknown))}")
+    return stages
+
+
+def load_cost_rules(path):
+    """COST_RULES with the entries of a JSON file replaced or added:
+    {"TYPE": [relative cost per input vertex, vertex count multiplier]}"""
+    with open(path) as f:
+        overrides = json.load(f)
+    costs = dict(COST_RULES)
+    for name, rule in overrides.items():
+        name = name.upper()
+        if name not in modifier_types():
+            raise ValueError(f"{path}: unknown modifier type {name}")
+        if (not isinstance(rule, list) or len(rule) != 2
+                or not all(isinstance(v, (int, float)) for v in rule)):
+            raise ValueError(f"{path}: {name} needs [cost per vertex, vertex count multiplier]")
+        costs[name] = (float(rule[0]), rule[1])
+    return costs
+
+
+def scene_rules(settings):
+    """StackRules from Bony's scene settings, the built-in ones where they are empty.
+    Raises ValueError or OSError for settings that can't be used."""
+    order = parse_stack_order(settings.modifier_order) if settings.modifier_order.strip() else STACK_ORDER
+    costs = (load_cost_rules(bpy.path.abspath(settings.modifier_costs_path))
+             if settings.modifier_costs_path else COST_RULES)
+    return StackRules(order, costs)
+
+
+def vertex_growth(m, max_viewport_levels=None, rules=DEFAULT_RULES):
+    if m.type == 'SUBSURF' and max_viewport_levels is not None:
+        return 4 ** min(m.levels, max_viewport_levels)
+    if m.type in ('SUBSURF', 'MULTIRES'):
+        return 4 ** m.levels
+    return rules.costs.get(m.type, DEFAULT_COST)[1]
+
+
+def stack_cost(obj, modifiers, max_viewport_levels=None, skip=(), rules=DEFAULT_RULES):
+    """Estimated per-frame cost in vertex evaluations of the viewport stack"""
+    n = len(obj.data.vertices)
+    cost = 0.0
+    for m in modifiers:
+        if not m.show_viewport or m.name in skip:
+            continue
+        cost += rules.costs.get(m.type, DEFAULT_COST)[0] * n
+        n *= vertex_growth(m, max_viewport_levels, rules)
+    return cost
+
+
+def stage_of(m, rules=DEFAULT_RULES):
+    for i, types in enumerate(rules.order):
+        if m.type in types:
+            return i
+    return None
+
+
+def sorted_names(modifiers, rules=DEFAULT_RULES):
+    last = len(rules.order) - 1
+    keyed = []
+    last_stage = 0
+    for pos, m in enumerate(modifiers):
+        stage = stage_of(m, rules)
+        if stage is None:
+            stage = min(last_stage, last - 0.5)
+        else:
+            last_stage = stage
+        keyed.append((stage, pos, m.name))
+    return [name for _, _, name in sorted(keyed)]
+
+
+def find_issues(obj, max_viewport_levels, rules=DEFAULT_RULES):
+    issues = []
+    seen_transfers = set()
+    for m in obj.modifiers:
+        target = REQUIRED_TARGETS.get(m.type)
+        if target and getattr(m, target) is None:
+            issues.append(Issue(m.name, 'NOOP', "has no target"))
+            continue
+        zero = ZERO_NOOPS.get(m.type)
+        if zero and getattr(m, zero) == 0:
+            issues.append(Issue(m.name, 'NOOP', f"{zero} is 0"))
+            continue
+        if m.type == 'DATA_TRANSFER':
+            key = (m.object.name,
+                   m.use_vert_data, tuple(sorted(m.data_types_verts)),
+                   m.use_edge_data, tuple(sorted(m.data_types_edges)),
+                   m.use_loop_data, tuple(sorted(m.data_types_loops)),
+                   m.use_poly_data, tuple(sorted(m.data_types_polys)))
+            if key in seen_transfers:
+                issues.append(Issue(m.name, 'DUPLICATE', f"duplicates another transfer from {m.object.name}"))
+                continue
+            seen_transfers.add(key)
+        if m.type == 'SUBSURF' and m.show_viewport:
+            if m.levels == 0:
+                issues.append(Issue(m.name, 'VIEWPORT_NOOP', "viewport levels are 0"))
+            elif m.levels > max_viewport_levels:
+                issues.append(Issue(m.name, 'LEVELS', f"viewport levels {m.levels} > {max_viewport_levels}"))
+
+    current = [m.name for m in obj.modifiers]
+    if sorted_names(obj.modifiers, rules) != current:
+        issues.append(Issue(None, 'ORDER', "out of order"))
+    return issues
+
+
+def planned_stack(obj, issues, rules=DEFAULT_RULES):
+    """Modifiers left after removals, in the fixed order"""
+    removed = {i.modifier for i in issues if i.kind in ('NOOP', 'DUPLICATE')}
+    kept = [m for m in obj.modifiers if m.name not in removed]
+    order = sorted_names(kept, rules)
+    return sorted(kept, key=lambda m: order.index(m.name))
+
+
+def analyze(obj, max_viewport_levels, rules=DEFAULT_RULES):
+    issues = find_issues(obj, max_viewport_levels, rules)
+    disabled = {i.modifier for i in issues if i.kind == 'VIEWPORT_NOOP'}
+    optimized = stack_cost(obj, planned_stack(obj, issues, rules), max_viewport_levels, disabled, rules)
+    return StackReport(obj, stack_cost(obj, obj.modifiers, rules=rules), optimized, issues)
+
+
+def reorder(obj, names):
+    from .bulk import run_on
+
+    for index, name in enumerate(names):
+        if obj.modifiers[index].name != name:
+            run_on(obj, bpy.ops.object.modifier_move_to_index, modifier=name, index=index)
+
+
+def fix(obj, issues, max_viewport_levels, remove=True, order=True, levels=True, rules=DEFAULT_RULES):
+    """Apply the fixes for issues found by find_issues(). Doesn't update the view layer."""
+    for i in issues:
+        m = obj.modifiers.get(i.modifier) if i.modifier else None
+        if m is None:
+            continue
+        if remove and i.kind in ('NOOP', 'DUPLICATE'):
+            obj.modifiers.remove(m)
+        elif remove and i.kind == 'VIEWPORT_NOOP':
+            m.show_viewport = False
+        elif levels and i.kind == 'LEVELS':
+            m.levels = max_viewport_levels
+    if order:
+        reorder(obj, sorted_names(obj.modifiers, rules))
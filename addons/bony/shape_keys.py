@@ -0,0 +1,117 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTIBILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# Shape key mixing with numpy, for applying and merging keys of many objects through
+# bulk.map_objects()
+#
+# This reads key block data, not evaluated meshes: the mix must leave out the modifier
+# stack (armature pose included), which is all mesh_cache.vertices() could add. Writers
+# invalidate the cache instead.
+
+import numpy as np
+from collections import namedtuple
+
+from . import mesh_cache
+from .mirror import read_weights
+
+
+# names, index of each key's relative key, effective values, per-key vertex weights
+# (None when the key has no vertex group), and {key index: (n, 3) co} of only the keys
+# the mix reads: Basis, keys with a non-zero value and their relative keys
+KeyData = namedtuple("KeyData", "names relative values weights co")
+
+
+def supported(obj):
+    """Whether the mix can be computed here. Absolute keys and pinned keys go the slow way."""
+    key = obj.data.shape_keys
+    return key is not None and key.use_relative and not obj.show_only_shape_key
+
+
+def gather(obj):
+    blocks = obj.data.shape_keys.key_blocks
+    n = len(obj.data.vertices)
+    relative = [blocks.find(kb.relative_key.name) for kb in blocks]
+    values = [0.0 if kb.mute else kb.value for kb in blocks]
+    active = [i for i in range(1, len(blocks)) if values[i] != 0]
+
+    # Daz figures have thousands of keys, most of them at 0: don't copy those
+    co = {}
+    for i in {0} | set(active) | {relative[i] for i in active}:
+        co[i] = np.empty(n * 3, dtype=np.float32)
+        blocks[i].data.foreach_get("co", co[i])
+        co[i] = co[i].reshape(n, 3)
+
+    groups = sorted({blocks[i].vertex_group for i in active if blocks[i].vertex_group in obj.vertex_groups})
+    group_weights, _ = read_weights(obj, groups) if groups else (None, None)
+    weights = [group_weights[:, groups.index(kb.vertex_group)] if i in active and kb.vertex_group in groups
+               else None for i, kb in enumerate(blocks)]
+
+    return KeyData(names=[kb.name for kb in blocks], relative=relative, values=values,
+                   weights=weights, co=co)
+
+
+def mix(data):
+    """Vertex positions with all keys mixed in, like shape_key_add(from_mix=True)"""
+    result = data.co[0].copy()
+    for i in range(1, len(data.names)):
+        value = data.values[i]
+        if value == 0:
+            continue
+        delta = data.co[i] - data.co[data.relative[i]]
+        if data.weights[i] is not None:
+            delta *= data.weights[i][:, None]
+        result += value * delta
+    return result
+
+
+def merge_into_basis(data, removed):
+    """Basis after blending the current mix into it, and how the kept keys follow it.
+    Like the edit-mode blend it replaces, keys relative to Basis move along with it.
+    Returns (basis co, offset, names of the kept keys to move by offset)"""
+    basis = mix(data)
+    offset = basis - data.co[0]
+    removed_indices = {data.names.index(name) for name in removed}
+
+    moved = []
+    for i in range(1, len(data.names)):
+        if i in removed_indices:
+            continue
+        relative = data.relative[i]
+        # Keys relative to a removed key become relative to Basis
+        if relative == 0 or relative in removed_indices:
+            moved.append(data.names[i])
+    return basis, offset, moved
+
+
+def write_applied(obj, co):
+    obj.shape_key_clear()
+    obj.data.vertices.foreach_set("co", co.ravel())
+    obj.data.update()
+    mesh_cache.invalidate(obj)
+
+
+def write_merged(obj, removed, result):
+    basis, offset, moved = result
+    key_blocks = obj.data.shape_keys.key_blocks
+    for name in removed:
+        obj.shape_key_remove(key_blocks[name])
+    key_blocks[0].data.foreach_set("co", basis.ravel())
+    # One key at a time, so only one extra copy is alive
+    co = np.empty(basis.size, dtype=np.float32)
+    for name in moved:
+        key_blocks[name].data.foreach_get("co", co)
+        co += offset.ravel()
+        key_blocks[name].data.foreach_set("co", co)
+    obj.data.vertices.foreach_set("co", basis.ravel())
+    obj.data.update()
+    mesh_cache.invalidate(obj)
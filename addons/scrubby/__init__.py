@@ -21,12 +21,30 @@ bl_info = {
     "category" : "Animation"
 }
 
+import time
+_import_start = time.perf_counter()
+
 import bpy
+import os
+import shutil
+import subprocess
+from collections import defaultdict
+from bpy.app.handlers import persistent
+
+try:
+    from bony import instrument
+except ImportError:
+    instrument = None
+
+STARTUP_TIMES = {}
+
 
-def register_managed_handler(handler_list, handler):
+def register_managed_handler(handler_list, handler, on_finished=None):
     def managed_handler(scene):
         def remove_managed_handler():
             handler_list[:] = [h for h in handler_list if h is not managed_handler]
+            if on_finished:
+                on_finished()
         
         finished = handler(scene)
         if type(finished) != bool:
@@ -39,6 +57,145 @@ def register_managed_handler(handler_list, handler):
     handler_list.append(managed_handler)
 
 
+def call_once(func):
+    called = False
+
+    def wrapper():
+        nonlocal called
+        if not called:
+            called = True
+            func()
+
+    return wrapper
+
+
+def watch_playback_stop(callback, interval=0.25):
+    # frame_change_post doesn't fire if the user cancels playback without
+    # restoring the frame, so poll for it too
+    # Timers run without a window, so bpy.context.screen is None here
+    def watch():
+        if any(w.screen and w.screen.is_animation_playing for w in bpy.context.window_manager.windows):
+            return interval
+        callback()
+        return None
+
+    bpy.app.timers.register(watch, first_interval=interval)
+
+
+def begin_playback(context):
+    """Prepare the scene for playback. Returns a function restoring it, safe to call more than once."""
+    settings = context.scene.scrubby_settings
+    restore_funcs = []
+
+    if settings.use_cached_playback:
+        from . import point_cache
+        restore_funcs.append(point_cache.begin_cached_playback(context))
+    if settings.use_performance_mode:
+        restore_funcs.append(begin_performance_mode(context))
+
+    def restore():
+        for f in reversed(restore_funcs):
+            f()
+
+    restore = call_once(restore)
+    watch_playback_stop(restore)
+    return restore
+
+
+# ------------------------------------------------------------------------
+#   Performance Mode
+#   Lower heavy modifiers of visible objects while playing
+# ------------------------------------------------------------------------
+
+def heavy_modifier_rules(settings):
+    """Map modifier type -> function simplifying it in place"""
+    rules = {}
+    if settings.simplify_subsurf:
+        def lower_levels(m):
+            m.levels = min(m.levels, settings.subsurf_levels)
+        rules['SUBSURF'] = lower_levels
+        rules['MULTIRES'] = lower_levels
+    if settings.disable_solidify:
+        rules['SOLIDIFY'] = lambda m: setattr(m, "show_viewport", False)
+    if settings.disable_corrective_smooth:
+        rules['CORRECTIVE_SMOOTH'] = lambda m: setattr(m, "show_viewport", False)
+    if settings.disable_data_transfer:
+        rules['DATA_TRANSFER'] = lambda m: setattr(m, "show_viewport", False)
+    return rules
+
+
+SNAPSHOT_ATTRS = ("show_viewport", "levels")
+
+
+def snapshot_modifier(m):
+    return {a: getattr(m, a) for a in SNAPSHOT_ATTRS if hasattr(m, a)}
+
+
+def begin_performance_mode(context):
+    rules = heavy_modifier_rules(context.scene.scrubby_settings)
+    snapshots = []
+    for obj in context.visible_objects:
+        for m in obj.modifiers:
+            simplify = rules.get(m.type)
+            if simplify and m.show_viewport:
+                snapshots.append((obj, m.name, snapshot_modifier(m)))
+                simplify(m)
+
+    def restore():
+        for obj, name, snapshot in snapshots:
+            m = obj.modifiers.get(name)
+            if m:
+                for a, v in snapshot.items():
+                    if getattr(m, a) != v:
+                        setattr(m, a, v)
+
+    return restore
+
+
+# ------------------------------------------------------------------------
+#   Cached Playback
+#   Bake the deformation stack to PC2 files and read them back with
+#   a Mesh Cache modifier during playback (see point_cache.py)
+# ------------------------------------------------------------------------
+
+# Modifiers that only move vertices around (so the vertex count stays the same)
+DEFORM_MODIFIER_TYPES = {
+    'ARMATURE', 'CAST', 'CORRECTIVE_SMOOTH', 'CURVE', 'DISPLACE', 'HOOK',
+    'LAPLACIANDEFORM', 'LAPLACIANSMOOTH', 'LATTICE', 'MESH_DEFORM',
+    'SHRINKWRAP', 'SIMPLE_DEFORM', 'SMOOTH', 'SURFACE_DEFORM', 'WARP', 'WAVE',
+}
+
+
+def deform_modifiers(obj):
+    """The leading run of deform-only modifiers, which is what a point cache can replace"""
+    prefix = []
+    for m in obj.modifiers:
+        if m.type not in DEFORM_MODIFIER_TYPES:
+            break
+        if m.show_viewport:
+            prefix.append(m)
+    return prefix
+
+
+# mesh pointer -> geometry edits seen, so point_cache only hashes vertex and shape key
+# coordinates again after they may have changed
+mesh_edit_stamps = defaultdict(int)
+
+
+@persistent
+def count_mesh_edits(scene, depsgraph):
+    for update in depsgraph.updates:
+        if isinstance(update.id, bpy.types.Mesh) and update.is_updated_geometry:
+            mesh_edit_stamps[update.id.original.as_pointer()] += 1
+
+
+def is_cacheable(obj):
+    if obj.type != 'MESH':
+        return False
+    has_keys = obj.data.shape_keys is not None and len(obj.data.shape_keys.key_blocks) > 1
+    return has_keys or any(m.type == 'ARMATURE' for m in deform_modifiers(obj))
+
+
 class PlayToEnd(bpy.types.Operator):
     bl_idname = "scrubby.play_to_end"
     bl_label = "Play to End"
@@ -62,7 +219,8 @@ class PlayToEnd(bpy.types.Operator):
                 return True
             return False
         
-        register_managed_handler(bpy.app.handlers.frame_change_post, check_stop)
+        restore = begin_playback(context)
+        register_managed_handler(bpy.app.handlers.frame_change_post, check_stop, restore)
         bpy.ops.screen.animation_play(reverse=self.reverse)
 
         return {'FINISHED'}
@@ -97,7 +255,8 @@ class PlayToNextMarker(bpy.types.Operator):
                 return True
             return False
         
-        register_managed_handler(bpy.app.handlers.frame_change_post, check_stop)
+        restore = begin_playback(context)
+        register_managed_handler(bpy.app.handlers.frame_change_post, check_stop, restore)
         bpy.ops.screen.animation_play(reverse=self.reverse)
 
         return {'FINISHED'}
@@ -136,24 +295,382 @@ class PlayPingPong(bpy.types.Operator):
             
             return False
         
-        register_managed_handler(bpy.app.handlers.frame_change_post, check_stop)
+        restore = begin_playback(context)
+        register_managed_handler(bpy.app.handlers.frame_change_post, check_stop, restore)
         bpy.ops.screen.animation_play()
 
         return {'FINISHED'}
-    
+
+
+class BakePlaybackCache(bpy.types.Operator):
+    bl_idname = "scrubby.bake_playback_cache"
+    bl_label = "Bake Playback Cache"
+    bl_description = "Bake the deformation of selected meshes over the play range for cached playback"
+    bl_options = {'REGISTER'}
+
+    @classmethod
+    def poll(cls, context):
+        return (not bpy.context.screen.is_animation_playing and
+                any(is_cacheable(o) for o in context.selected_objects))
+
+
+    def execute(self, context):
+        from . import point_cache
+        objs = [o for o in context.selected_objects if is_cacheable(o)]
+        caches = point_cache.bake_point_caches(context, objs)
+        self.report({'INFO'}, f"Baked {len(caches)} object(s) to {point_cache.cache_dir()}")
+        return {'FINISHED'}
+
+
+class ClearPlaybackCache(bpy.types.Operator):
+    bl_idname = "scrubby.clear_playback_cache"
+    bl_label = "Clear Playback Cache"
+    bl_description = "Delete all baked playback caches"
+    bl_options = {'REGISTER'}
+
+    @classmethod
+    def poll(cls, context):
+        return not bpy.context.screen.is_animation_playing
+
+
+    def execute(self, context):
+        from . import point_cache
+        directory = point_cache.cache_dir()
+        if os.path.isdir(directory):
+            for name in os.listdir(directory):
+                if name.endswith(".pc2"):
+                    os.remove(os.path.join(directory, name))
+        return {'FINISHED'}
+
+
+# ------------------------------------------------------------------------
+#   Preview Render
+#   Render a play range with a pool of background Blender processes
+# ------------------------------------------------------------------------
+
+PREVIEW_DIR_NAME = "scrubby_preview"
+
+RENDER_WORKER_SCRIPT = """
+import bpy
+scene = bpy.context.scene
+scene.render.engine = 'CYCLES'
+scene.cycles.device = 'CPU'
+scene.cycles.samples = {samples}
+scene.render.resolution_percentage = {resolution_percentage}
+scene.render.threads_mode = 'FIXED'
+scene.render.threads = {threads}
+scene.render.use_file_extension = True
+scene.render.image_settings.file_format = 'PNG'
+scene.render.filepath = {filepath!r}
+"""
+
+ENCODE_WORKER_SCRIPT = """
+import bpy, os
+scene = bpy.context.scene
+files = sorted(f for f in os.listdir({frames_dir!r}) if f.endswith('.png'))
+strip = scene.sequence_editor_create().sequences.new_image(
+    'preview', os.path.join({frames_dir!r}, files[0]), 1, 1)
+for f in files[1:]:
+    strip.elements.append(f)
+scene.frame_start = 1
+scene.frame_end = len(files)
+scene.render.fps = {fps}
+scene.render.resolution_x = {resolution_x}
+scene.render.resolution_y = {resolution_y}
+scene.render.resolution_percentage = 100
+scene.render.image_settings.file_format = 'FFMPEG'
+scene.render.ffmpeg.format = 'MPEG4'
+scene.render.ffmpeg.codec = 'H264'
+scene.render.filepath = {filepath!r}
+bpy.ops.render.render(animation=True)
+"""
+
+
+def play_range(scene, play_mode):
+    """Frames to render and the order to show them in for the given Scrubby play mode"""
+    if play_mode == 'TO_END':
+        frames = list(range(scene.frame_current, scene.frame_end + 1))
+        return frames, frames
+    if play_mode == 'TO_NEXT_MARKER':
+        stops = [m.frame for m in scene.timeline_markers if m.frame > scene.frame_current]
+        end = min(stops + [scene.frame_end])
+        frames = list(range(scene.frame_current, end + 1))
+        return frames, frames
+    # Ping pong: render once, show forward then backward
+    frames = list(range(scene.frame_start, scene.frame_end + 1))
+    return frames, frames + frames[-2:0:-1]
+
+
+def split_chunks(frames, n_chunks):
+    size = max(1, -(-len(frames) // n_chunks))
+    return [(frames[i], frames[min(i + size, len(frames)) - 1]) for i in range(0, len(frames), size)]
+
+
+def preview_workers(settings):
+    cores = os.cpu_count() or 1
+    workers = settings.preview_workers or max(1, cores // 4)
+    return workers, max(1, cores // workers)
+
+
+def link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+class RenderPreview(bpy.types.Operator):
+    bl_idname = "scrubby.render_preview"
+    bl_label = "Render Preview"
+    bl_description = """Render the play range with background Cycles CPU workers
+                        and assemble it into a preview movie (uses the saved file)"""
+    bl_options = {'REGISTER'}
+
+    play_mode: bpy.props.EnumProperty(
+            items = [('TO_END', 'To End', 'Current frame to the end frame'),
+                     ('TO_NEXT_MARKER', 'To Next Marker', 'Current frame to the next marker'),
+                     ('PING_PONG', 'Ping Pong', 'Start to end then back to start')],
+            name = "Play Mode",
+            default = 'PING_PONG')
+
+    @classmethod
+    def poll(cls, context):
+        return bool(bpy.data.filepath)
+
+
+    def launch(self, args):
+        return subprocess.Popen([bpy.app.binary_path, "--background"] + args,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+    def start_next_chunks(self):
+        while self.pending and len(self.running) < self.n_workers:
+            start, end = self.pending.pop(0)
+            script = RENDER_WORKER_SCRIPT.format(
+                samples=self.settings.preview_samples,
+                resolution_percentage=self.settings.preview_resolution_percentage,
+                threads=self.n_threads,
+                filepath=os.path.join(self.frames_dir, "####"))
+            proc = self.launch([bpy.data.filepath, "--python-expr", script,
+                                "-s", str(start), "-e", str(end), "-a"])
+            self.running.append((proc, start, end))
+
+
+    def rendered_count(self):
+        return len([f for f in os.listdir(self.frames_dir) if f.endswith(".png")])
+
+
+    def assemble(self, context):
+        scene = context.scene
+        for i, frame in enumerate(self.order):
+            src = os.path.join(self.frames_dir, f"{frame:04d}.png")
+            if not os.path.exists(src):
+                raise RuntimeError(f"Frame {frame} failed to render")
+            link_or_copy(src, os.path.join(self.sequence_dir, f"{i + 1:04d}.png"))
+
+        scale = self.settings.preview_resolution_percentage / 100
+        script = ENCODE_WORKER_SCRIPT.format(
+            frames_dir=self.sequence_dir,
+            fps=scene.render.fps,
+            resolution_x=int(scene.render.resolution_x * scale),
+            resolution_y=int(scene.render.resolution_y * scale),
+            filepath=self.movie_path)
+        return self.launch(["--factory-startup", "--python-expr", script])
+
+
+    def finish(self, context):
+        context.window_manager.event_timer_remove(self.timer)
+        context.window_manager.progress_end()
+        context.workspace.status_text_set(None)
+
+
+    def cancel(self, context):
+        for proc, _, _ in self.running:
+            proc.terminate()
+        if self.encoder:
+            self.encoder.terminate()
+        self.finish(context)
+
+
+    def execute(self, context):
+        scene = context.scene
+        self.settings = scene.scrubby_settings
+        if bpy.data.is_dirty:
+            self.report({'WARNING'}, "Unsaved changes won't be in the preview")
+
+        frames, self.order = play_range(scene, self.play_mode)
+        if not frames:
+            self.report({'ERROR'}, "The play range is empty, nothing to render")
+            return {'CANCELLED'}
+        self.n_workers, self.n_threads = preview_workers(self.settings)
+        # More chunks than workers so a slow chunk doesn't hold the others back
+        self.pending = split_chunks(frames, self.n_workers * 2)
+        self.running = []
+        self.failed = []
+        self.encoder = None
+        self.n_frames = len(frames)
+
+        root = os.path.join(bpy.path.abspath(f"//{PREVIEW_DIR_NAME}"), time.strftime("%Y%m%d-%H%M%S"))
+        self.frames_dir = os.path.join(root, "frames")
+        self.sequence_dir = os.path.join(root, "sequence")
+        self.movie_path = os.path.join(root, f"{self.play_mode.lower()}_")
+        os.makedirs(self.frames_dir)
+        os.makedirs(self.sequence_dir)
+
+        self.start_next_chunks()
+
+        wm = context.window_manager
+        wm.progress_begin(0, self.n_frames)
+        self.timer = wm.event_timer_add(0.5, window=context.window)
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+
+    def modal(self, context, event):
+        if event.type == 'ESC':
+            self.cancel(context)
+            self.report({'WARNING'}, "Preview render cancelled")
+            return {'CANCELLED'}
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+
+        if self.encoder:
+            if self.encoder.poll() is None:
+                return {'PASS_THROUGH'}
+            self.finish(context)
+            if self.encoder.returncode != 0:
+                self.report({'ERROR'}, "Failed to encode the preview")
+                return {'CANCELLED'}
+            self.report({'INFO'}, f"Preview saved to {os.path.dirname(self.movie_path)}")
+            return {'FINISHED'}
+
+        still_running = []
+        for proc, start, end in self.running:
+            if proc.poll() is None:
+                still_running.append((proc, start, end))
+            elif proc.returncode != 0:
+                self.failed.append((start, end))
+        self.running = still_running
+        self.start_next_chunks()
+
+        done = self.rendered_count()
+        context.window_manager.progress_update(done)
+        context.workspace.status_text_set(
+            f"Scrubby preview: {done}/{self.n_frames} frames, {len(self.running)} workers (Esc to cancel)")
+
+        if self.running or self.pending:
+            return {'PASS_THROUGH'}
+
+        if self.failed:
+            self.finish(context)
+            self.report({'ERROR'}, f"Workers failed on frames {self.failed}")
+            return {'CANCELLED'}
+
+        try:
+            self.encoder = self.assemble(context)
+        except RuntimeError as e:
+            self.finish(context)
+            self.report({'ERROR'}, str(e))
+            return {'CANCELLED'}
+        context.workspace.status_text_set("Scrubby preview: encoding")
+        return {'PASS_THROUGH'}
+
+
+class ScrubbySettings(bpy.types.PropertyGroup):
+    use_cached_playback: bpy.props.BoolProperty(
+        name="Cached Playback",
+        description="Play selected deformed meshes from a baked point cache (baked on demand)",
+        default=False)
+
+    use_performance_mode: bpy.props.BoolProperty(
+        name="Performance Mode",
+        description="Simplify heavy modifiers of visible objects while playing and restore them afterwards",
+        default=False)
+    simplify_subsurf: bpy.props.BoolProperty(name="Lower Subdivision", default=True)
+    subsurf_levels: bpy.props.IntProperty(name="Subdivision Levels", default=0, min=0, max=6)
+    disable_solidify: bpy.props.BoolProperty(name="Disable Solidify", default=True)
+    disable_corrective_smooth: bpy.props.BoolProperty(name="Disable Corrective Smooth", default=True)
+    disable_data_transfer: bpy.props.BoolProperty(name="Disable Data Transfer", default=True)
+
+    preview_workers: bpy.props.IntProperty(
+        name="Preview Workers",
+        description="Number of background Blender processes (0 for one per 4 cores)",
+        default=0, min=0)
+    preview_samples: bpy.props.IntProperty(name="Preview Samples", default=16, min=1)
+    preview_resolution_percentage: bpy.props.IntProperty(
+        name="Preview Resolution", subtype='PERCENTAGE', default=50, min=1, max=100)
+
+
+class SCRUBBY_MT_Timeline(bpy.types.Menu):
+    bl_idname = "SCRUBBY_MT_timeline"
+    bl_label = "Scrubby"
+
+    def draw(self, context):
+        layout = self.layout
+        settings = context.scene.scrubby_settings
+
+        layout.operator(PlayToEnd.bl_idname)
+        layout.operator(PlayToNextMarker.bl_idname)
+        layout.operator(PlayPingPong.bl_idname)
+
+        layout.separator()
+        layout.prop(settings, "use_cached_playback")
+        layout.operator(BakePlaybackCache.bl_idname)
+        layout.operator(ClearPlaybackCache.bl_idname)
+
+        layout.separator()
+        layout.prop(settings, "use_performance_mode")
+        col = layout.column()
+        col.active = settings.use_performance_mode
+        col.prop(settings, "simplify_subsurf")
+        col.prop(settings, "subsurf_levels")
+        col.prop(settings, "disable_solidify")
+        col.prop(settings, "disable_corrective_smooth")
+        col.prop(settings, "disable_data_transfer")
+
+        layout.separator()
+        layout.operator_menu_enum(RenderPreview.bl_idname, "play_mode")
+        layout.prop(settings, "preview_workers")
+        layout.prop(settings, "preview_samples")
+        layout.prop(settings, "preview_resolution_percentage")
+
+
+def draw_timeline_menu(self, context):
+    self.layout.menu(SCRUBBY_MT_Timeline.bl_idname)
+
 
 CLASSES_TO_REGISTER = [
+    ScrubbySettings,
     PlayToEnd,
     PlayToNextMarker,
     PlayPingPong,
+    BakePlaybackCache,
+    ClearPlaybackCache,
+    RenderPreview,
+    SCRUBBY_MT_Timeline,
 ]
 
 def register():
+    start = time.perf_counter()
+    if instrument:
+        instrument.instrument_operators(CLASSES_TO_REGISTER)
     [bpy.utils.register_class(klass) for klass in CLASSES_TO_REGISTER]
+    bpy.types.Scene.scrubby_settings = bpy.props.PointerProperty(type=ScrubbySettings)
+    bpy.types.TIME_MT_editor_menus.append(draw_timeline_menu)
+    bpy.app.handlers.depsgraph_update_post.append(count_mesh_edits)
+    STARTUP_TIMES["register"] = time.perf_counter() - start
 
 
 def unregister():
+    if count_mesh_edits in bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.remove(count_mesh_edits)
+    mesh_edit_stamps.clear()
     try:
+        bpy.types.TIME_MT_editor_menus.remove(draw_timeline_menu)
         [bpy.utils.unregister_class(klass) for klass in CLASSES_TO_REGISTER]
+        del bpy.types.Scene.scrubby_settings
     except RuntimeError:
-        pass
\ No newline at end of file
+        pass
+
+
+STARTUP_TIMES["import"] = time.perf_counter() - _import_start
@@ -0,0 +1,267 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTIBILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# Baking the deformation stack to PC2 files and reading them back with a
+# Mesh Cache modifier
+
+import bpy
+import os
+import re
+import hashlib
+import numpy as np
+
+from . import deform_modifiers, is_cacheable, mesh_edit_stamps
+
+
+CACHE_MODIFIER_NAME = "ScrubbyCache"
+CACHE_DIR_NAME = "scrubby_cache"
+
+# mesh pointer -> (edit stamp, digest of its vertex and shape key coordinates)
+_coordinate_digests = {}
+
+
+def cache_dir():
+    if bpy.data.filepath:
+        return bpy.path.abspath(f"//{CACHE_DIR_NAME}")
+    return os.path.join(bpy.app.tempdir, CACHE_DIR_NAME)
+
+
+def _hash_animation(h, id_data):
+    anim = id_data.animation_data if id_data else None
+    if not anim:
+        return
+    if anim.action:
+        h.update(anim.action.name.encode())
+        for fc in anim.action.fcurves:
+            co = np.empty(len(fc.keyframe_points) * 2, dtype=np.float32)
+            fc.keyframe_points.foreach_get("co", co)
+            h.update(f"{fc.data_path}[{fc.array_index}]{fc.mute}".encode())
+            h.update(co.tobytes())
+    for fc in anim.drivers:
+        d = fc.driver
+        h.update(f"{fc.data_path}[{fc.array_index}]{d.type}{d.expression}{fc.mute}".encode())
+        for v in d.variables:
+            for t in v.targets:
+                h.update(f"{v.name}{t.id.name if t.id else ''}{t.data_path}{t.bone_target}".encode())
+
+
+def _hash_settings(h, struct):
+    """Hash every plain property of an RNA struct (e.g. a modifier's settings)"""
+    for prop in struct.bl_rna.properties:
+        if prop.identifier == "rna_type" or prop.type == 'COLLECTION':
+            continue
+        value = getattr(struct, prop.identifier)
+        if prop.type == 'POINTER':
+            value = getattr(value, "name", None)
+        elif getattr(prop, "is_array", False):
+            value = tuple(value)
+        h.update(f"{prop.identifier}={value!r};".encode())
+
+
+def _hash_rig(h, armature):
+    bones = armature.data.bones
+    rest = np.empty(len(bones) * 16, dtype=np.float32)
+    bones.foreach_get("matrix_local", rest)
+    h.update(rest.tobytes())
+    for b in armature.pose.bones:
+        for c in b.constraints:
+            target = getattr(c, "target", None)
+            h.update(f"{b.name}{c.type}{c.mute}{c.influence}{target.name if target else ''}".encode())
+    _hash_animation(h, armature)
+
+
+def _coordinate_digest(mesh):
+    """Digest of the vertex and key block coordinates, recomputed only after mesh edits"""
+    ptr = mesh.as_pointer()
+    stamp = mesh_edit_stamps[ptr]
+    cached = _coordinate_digests.get(ptr)
+    if cached and cached[0] == stamp:
+        return cached[1]
+
+    h = hashlib.sha1()
+    co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", co)
+    h.update(co.tobytes())
+    if mesh.shape_keys:
+        for kb in mesh.shape_keys.key_blocks:
+            kb.data.foreach_get("co", co)
+            h.update(co.tobytes())
+    _coordinate_digests[ptr] = (stamp, h.digest())
+    return h.digest()
+
+
+def deformation_fingerprint(scene, obj):
+    """Hash everything the baked positions depend on: range, mesh, shape keys, rig and animation"""
+    h = hashlib.sha1()
+    mesh = obj.data
+    h.update(f"{scene.frame_start}:{scene.frame_end}:{len(mesh.vertices)}".encode())
+
+    h.update(_coordinate_digest(mesh))
+
+    if mesh.shape_keys:
+        for kb in mesh.shape_keys.key_blocks:
+            h.update(f"{kb.name}{kb.mute}{kb.relative_key.name}{kb.vertex_group}"
+                     f"{kb.value}{kb.slider_min}{kb.slider_max}".encode())
+        _hash_animation(h, mesh.shape_keys)
+
+    _hash_animation(h, obj)
+    for m in deform_modifiers(obj):
+        target = getattr(m, "object", None)
+        _hash_settings(h, m)
+        if m.type == 'ARMATURE' and target:
+            _hash_rig(h, target)
+
+    return h.hexdigest()[:16]
+
+
+def cache_path(obj, fingerprint):
+    return os.path.join(cache_dir(), f"{bpy.path.clean_name(obj.name)}_{fingerprint}.pc2")
+
+
+def cache_name_pattern(obj):
+    """Matches the cache files of obj only, so baking Body leaves those of Body_001 alone"""
+    return re.compile(rf"^{re.escape(bpy.path.clean_name(obj.name))}_[0-9a-f]{{16}}\.pc2$")
+
+
+def write_pc2_header(f, n_points, start_frame, n_samples):
+    f.write(b"POINTCACHE2\0")
+    f.write(np.array([1, n_points], dtype='<i4').tobytes())
+    f.write(np.array([start_frame, 1.0], dtype='<f4').tobytes())
+    f.write(np.array([n_samples], dtype='<i4').tobytes())
+
+
+PC2_HEADER_SIZE = 32
+
+
+def bake_point_caches(context, objs):
+    """Bake evaluated vertex positions of objs over the scene range. Returns {obj: path}."""
+    scene = context.scene
+    depsgraph = context.evaluated_depsgraph_get()
+    frames = range(scene.frame_start, scene.frame_end + 1)
+    os.makedirs(cache_dir(), exist_ok=True)
+
+    caches = {}
+    hidden = []
+    for obj in objs:
+        fingerprint = deformation_fingerprint(scene, obj)
+        path = cache_path(obj, fingerprint)
+        n = len(obj.data.vertices)
+
+        # Remove stale caches of this object
+        pattern = cache_name_pattern(obj)
+        for name in os.listdir(cache_dir()):
+            if pattern.match(name) and name != os.path.basename(path):
+                os.remove(os.path.join(cache_dir(), name))
+
+        with open(path, "wb") as f:
+            write_pc2_header(f, n, scene.frame_start, len(frames))
+            f.truncate(PC2_HEADER_SIZE + len(frames) * n * 3 * 4)
+        caches[obj] = (path, np.memmap(path, dtype='<f4', mode='r+', offset=PC2_HEADER_SIZE,
+                                       shape=(len(frames), n * 3)))
+
+        # Only bake the deformation part of the stack, the rest stays live
+        cached = set(m.name for m in deform_modifiers(obj))
+        for m in obj.modifiers:
+            if m.show_viewport and m.name not in cached:
+                m.show_viewport = False
+                hidden.append(m)
+
+    frame_current = scene.frame_current
+    wm = context.window_manager
+    wm.progress_begin(0, len(frames))
+    try:
+        for i, frame in enumerate(frames):
+            scene.frame_set(frame)
+            for obj, (_, data) in caches.items():
+                evaluated = obj.evaluated_get(depsgraph)
+                mesh = evaluated.to_mesh()
+                mesh.vertices.foreach_get("co", data[i])
+                evaluated.to_mesh_clear()
+            wm.progress_update(i)
+    finally:
+        wm.progress_end()
+        for m in hidden:
+            m.show_viewport = True
+        scene.frame_set(frame_current)
+        for _, data in caches.values():
+            data.flush()
+
+    return {obj: path for obj, (path, _) in caches.items()}
+
+
+def find_point_caches(context, objs):
+    """Split objs into ({obj: path} with a valid cache, [objs needing a bake])"""
+    found, missing = {}, []
+    for obj in objs:
+        path = cache_path(obj, deformation_fingerprint(context.scene, obj))
+        if os.path.exists(path):
+            found[obj] = path
+        else:
+            missing.append(obj)
+    return found, missing
+
+
+def swap_in_point_cache(context, obj, path):
+    """Replace the live deformation of obj with a Mesh Cache modifier. Returns a function undoing it."""
+    scene = context.scene
+    disabled = [m for m in deform_modifiers(obj)]
+    for m in disabled:
+        m.show_viewport = False
+
+    muted = []
+    if obj.data.shape_keys:
+        muted = [kb for kb in obj.data.shape_keys.key_blocks if not kb.mute]
+        for kb in muted:
+            kb.mute = True
+
+    mc = obj.modifiers.new(CACHE_MODIFIER_NAME, 'MESH_CACHE')
+    mc.cache_format = 'PC2'
+    mc.filepath = path
+    mc.deform_mode = 'OVERWRITE'
+    mc.interpolation = 'NONE'
+    mc.time_mode = 'FRAME'
+    mc.play_mode = 'SCENE'
+    mc.frame_start = scene.frame_start
+    if hasattr(context, "temp_override"):
+        with context.temp_override(object=obj, active_object=obj):
+            bpy.ops.object.modifier_move_to_index(modifier=mc.name, index=0)
+    else:
+        # Before Blender 3.2. Blender 4.0 no longer takes the override as an argument.
+        bpy.ops.object.modifier_move_to_index({'object': obj}, modifier=mc.name, index=0)
+
+    def restore():
+        m = obj.modifiers.get(CACHE_MODIFIER_NAME)
+        if m:
+            obj.modifiers.remove(m)
+        for m in disabled:
+            m.show_viewport = True
+        for kb in muted:
+            kb.mute = False
+
+    return restore
+
+
+def begin_cached_playback(context):
+    objs = [o for o in context.selected_objects if is_cacheable(o)]
+    caches, missing = find_point_caches(context, objs)
+    if missing:
+        caches.update(bake_point_caches(context, missing))
+
+    restore_funcs = [swap_in_point_cache(context, obj, path) for obj, path in caches.items()]
+
+    def restore():
+        for f in restore_funcs:
+            f()
+        context.view_layer.update()
+
+    return restore
@@ -0,0 +1,420 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTIBILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmark Bony and Scrubby operators on synthetic Daz-like scenes.
+
+Run with plain Python, it drives Blender:
+
+    python benchmarks/bench_bony.py --blender /path/to/blender --preset small medium \
+        --output results.json --baseline baseline.json
+
+Each scene is built once per spec (seeded, so it's reproducible) and saved,
+then every operator runs in its own `blender --background` process so wall
+time and peak memory aren't polluted by the other runs.
+"""
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+import subprocess
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ADDONS_DIR = os.path.join(REPO_DIR, "addons")
+
+# vertices, bones, shape keys, driver chain depth
+PRESETS = {
+    "small": dict(vertices=10_000, bones=100, shape_keys=100, driver_depth=2),
+    "medium": dict(vertices=100_000, bones=300, shape_keys=500, driver_depth=4),
+    # Needs ~12GB of RAM, like the real thing
+    "large": dict(vertices=500_000, bones=600, shape_keys=2_000, driver_depth=8),
+}
+
+OPERATORS = [
+    "rename_daz_bones",
+    "reposition_bones",
+    "apply_shape_keys",
+    "merge_non_corrective_shape_keys",
+    "transfer_rigging",
+    "scrubby_bake_playback_cache",
+]
+
+BONE_NAMES = ["Shldr", "ForearmBend", "ForearmTwist", "Hand", "Thigh", "Shin", "Foot",
+              "Toe", "Pectoral", "Eye", "Ear", "Brow", "Cheek", "Lip", "Index", "Mid",
+              "Ring", "Pinky", "Thumb", "Carpal"]
+CHAIN_LENGTH = 10
+HEIGHT = 1.8
+
+
+# ------------------------------------------------------------------------
+#   Inside Blender
+# ------------------------------------------------------------------------
+
+def add_grid_mesh(name, n_vertices, y_offset):
+    import bpy
+    import numpy as np
+
+    side = max(2, int(round(n_vertices ** 0.5)))
+    xs, zs = np.meshgrid(np.linspace(-0.5, 0.5, side), np.linspace(0, HEIGHT, side))
+    co = np.c_[xs.ravel(), np.full(side * side, y_offset), zs.ravel()].astype(np.float32)
+
+    i = np.arange(side - 1)
+    a = (i[:, None] * side + i[None, :]).ravel()
+    quads = np.c_[a, a + 1, a + side + 1, a + side].astype(np.int32)
+
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(len(co))
+    mesh.vertices.foreach_set("co", co.ravel())
+    mesh.loops.add(quads.size)
+    mesh.loops.foreach_set("vertex_index", quads.ravel())
+    mesh.polygons.add(len(quads))
+    mesh.polygons.foreach_set("loop_start", np.arange(0, quads.size, 4, dtype=np.int32))
+    mesh.polygons.foreach_set("loop_total", np.full(len(quads), 4, dtype=np.int32))
+    # Edges aren't given above, let Blender derive them from the faces
+    mesh.update(calc_edges=True)
+    mesh.validate()
+
+    obj = bpy.data.objects.new(name, mesh)
+    bpy.context.scene.collection.objects.link(obj)
+    return obj, co
+
+
+def bone_name(i):
+    chain, j = divmod(i, CHAIN_LENGTH)
+    side = ("l", "r", "")[chain % 3]
+    return f"{side}{BONE_NAMES[j % len(BONE_NAMES)]}{chain}"
+
+
+def add_armature(n_bones, frames):
+    import bpy
+
+    n_chains = -(-n_bones // CHAIN_LENGTH)
+    arm = bpy.data.armatures.new("Genesis8")
+    obj = bpy.data.objects.new("Genesis8", arm)
+    bpy.context.scene.collection.objects.link(obj)
+    bpy.context.view_layer.objects.active = obj
+    bpy.ops.object.mode_set(mode='EDIT')
+
+    names = []
+    segment = HEIGHT / CHAIN_LENGTH
+    for i in range(n_bones):
+        chain, j = divmod(i, CHAIN_LENGTH)
+        x = (chain + 0.5) / n_chains - 0.5
+        eb = arm.edit_bones.new(bone_name(i))
+        eb.head = (x, 0, j * segment)
+        eb.tail = (x, 0, (j + 1) * segment)
+        if j > 0:
+            eb.parent = arm.edit_bones[names[-1]]
+            eb.use_connect = True
+        names.append(eb.name)
+    bpy.ops.object.mode_set(mode='OBJECT')
+
+    # Something for Scrubby to bake
+    for name in names[::CHAIN_LENGTH]:
+        pb = obj.pose.bones[name]
+        for frame, angle in ((1, 0.0), (frames // 2, 0.5), (frames, 0.0)):
+            pb.rotation_quaternion = (1, angle, 0, 0)
+            pb.keyframe_insert("rotation_quaternion", frame=frame)
+
+    return obj, names, n_chains
+
+
+def skin(obj, co, armature, bone_names, n_chains):
+    import numpy as np
+
+    chain = np.clip(((co[:, 0] + 0.5) * n_chains).astype(int), 0, n_chains - 1)
+    j = np.clip((co[:, 2] / HEIGHT * CHAIN_LENGTH).astype(int), 0, CHAIN_LENGTH - 1)
+    primary = np.minimum(chain * CHAIN_LENGTH + j, len(bone_names) - 1)
+    secondary = np.minimum(primary + 1, len(bone_names) - 1)
+
+    groups = [obj.vertex_groups.new(name=n) for n in bone_names]
+    for bones, weight in ((primary, 0.7), (secondary, 0.3)):
+        order = np.argsort(bones, kind='stable')
+        splits = np.searchsorted(bones[order], np.arange(len(bone_names) + 1))
+        for g in range(len(bone_names)):
+            indices = order[splits[g]:splits[g + 1]]
+            if len(indices):
+                groups[g].add(indices.tolist(), weight, 'ADD')
+
+    mod = obj.modifiers.new("Armature", 'ARMATURE')
+    mod.object = armature
+
+
+def add_shape_keys(obj, co, n_keys, driver_depth, armature, bone_names, rng):
+    import numpy as np
+
+    n = len(co)
+    region = max(1, n // 20)
+    obj.shape_key_add(name="Basis")
+    key = obj.data.shape_keys
+
+    for i in range(n_keys):
+        kb = obj.shape_key_add(name=f"Morph{i}", from_mix=False)
+        start = int(rng.integers(0, max(1, n - region)))
+        deformed = co.copy()
+        deformed[start:start + region] += rng.normal(0, 0.01, (min(region, n - start), 3)).astype(np.float32)
+        kb.data.foreach_set("co", deformed.ravel())
+        kb.value = 1.0 if rng.random() < 0.3 else 0.0
+
+        # Chains of single property drivers (non-corrective, like Daz's morph controllers)
+        # headed by bone driven ones (corrective, like JCMs) on every other chain
+        depth = i % (driver_depth + 1)
+        if depth == 0 and (i // (driver_depth + 1)) % 2 == 1:
+            driver = kb.driver_add("value").driver
+            var = driver.variables.new()
+            var.type = 'TRANSFORMS'
+            var.targets[0].id = armature
+            var.targets[0].bone_target = bone_names[int(rng.integers(0, len(bone_names)))]
+            var.targets[0].transform_type = 'ROT_X'
+            var.targets[0].transform_space = 'LOCAL_SPACE'
+            driver.expression = var.name
+        elif depth > 0:
+            driver = kb.driver_add("value").driver
+            var = driver.variables.new()
+            var.type = 'SINGLE_PROP'
+            var.targets[0].id_type = 'KEY'
+            var.targets[0].id = key
+            var.targets[0].data_path = f'key_blocks["Morph{i - 1}"].value'
+            driver.expression = var.name
+
+
+def build_scene(spec, path):
+    import bpy
+    import numpy as np
+
+    rng = np.random.default_rng(spec["seed"])
+    bpy.ops.wm.read_factory_settings(use_empty=True)
+    scene = bpy.context.scene
+    scene.frame_start = 1
+    scene.frame_end = spec["frames"]
+
+    armature, bone_names, n_chains = add_armature(spec["bones"], spec["frames"])
+    body, body_co = add_grid_mesh("Genesis8.Shape", spec["vertices"], 0.0)
+    skin(body, body_co, armature, bone_names, n_chains)
+    add_shape_keys(body, body_co, spec["shape_keys"], spec["driver_depth"], armature, bone_names, rng)
+    add_grid_mesh("Clothing", max(1000, spec["vertices"] // 10), 0.01)
+
+    bpy.ops.wm.save_as_mainfile(filepath=path)
+
+
+def select(active, *others):
+    import bpy
+
+    for o in bpy.context.selected_objects:
+        o.select_set(False)
+    for o in (active,) + others:
+        o.select_set(True)
+    bpy.context.view_layer.objects.active = active
+
+
+def prepare_operator(name):
+    """Select what the operator needs and return a function running it"""
+    import bpy
+
+    armature = bpy.data.objects["Genesis8"]
+    body = bpy.data.objects["Genesis8.Shape"]
+    cloth = bpy.data.objects["Clothing"]
+
+    if name == "rename_daz_bones":
+        select(armature)
+        return bpy.ops.bony.rename_daz_bones
+    if name == "reposition_bones":
+        select(armature, body)
+        return bpy.ops.bony.reposition_bones
+    if name == "apply_shape_keys":
+        select(body)
+        return bpy.ops.bony.apply_shape_keys
+    if name == "merge_non_corrective_shape_keys":
+        select(body)
+        return bpy.ops.bony.merge_non_corrective_shape_keys
+    if name == "transfer_rigging":
+        bpy.context.scene.bony_settings.transfer_source = body
+        select(cloth)
+        return bpy.ops.bony.transfer_rigging
+    if name == "scrubby_bake_playback_cache":
+        import scrubby.point_cache
+        select(body)
+        return lambda: scrubby.point_cache.bake_point_caches(bpy.context, [body])
+    raise ValueError(f"Unknown operator {name}")
+
+
+def current_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def peak_rss_mb():
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_operator(name, result_path):
+    sys.path.insert(0, ADDONS_DIR)
+    import bony
+    import scrubby
+    bony.register()
+    scrubby.register()
+
+    result = {"operator": name, "ok": True, "error": None}
+    run = prepare_operator(name)
+    result["rss_before_mb"] = current_rss_mb()
+    with bony.instrument.Span(name, "benchmark") as span:
+        try:
+            run()
+        except Exception as e:
+            result["ok"] = False
+            result["error"] = f"{type(e).__name__}: {e}"
+    result["wall_s"] = span.duration
+    result["peak_rss_mb"] = peak_rss_mb()
+    result["ops_calls"] = span.ops_calls
+    result["mode_switches"] = span.mode_switches
+    result["stages"] = [{"name": e.name, "depth": e.depth, "wall_s": e.duration}
+                        for e in bony.instrument.events if e is not span]
+
+    with open(result_path, "w") as f:
+        json.dump(result, f)
+
+
+def blender_main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--build", metavar="SPEC_JSON")
+    parser.add_argument("--out")
+    parser.add_argument("--run", metavar="OPERATOR")
+    parser.add_argument("--result")
+    args = parser.parse_args(argv)
+
+    if args.build:
+        build_scene(json.loads(args.build), args.out)
+    else:
+        run_operator(args.run, args.result)
+
+
+# ------------------------------------------------------------------------
+#   Driver
+# ------------------------------------------------------------------------
+
+def spec_id(spec):
+    return hashlib.sha1(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:10]
+
+
+def blender(args, blender_path, timeout):
+    cmd = [blender_path, "--background", "--factory-startup"] + args
+    return subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                          timeout=timeout, text=True)
+
+
+def run_scenario(name, spec, args):
+    scene_path = os.path.join(args.cache_dir, f"{name}_{spec_id(spec)}.blend")
+    if not os.path.exists(scene_path):
+        print(f"[{name}] building {scene_path}")
+        proc = blender(["--python", __file__, "--", "--build", json.dumps(spec), "--out", scene_path],
+                       args.blender, args.timeout)
+        if proc.returncode != 0 or not os.path.exists(scene_path):
+            raise RuntimeError(f"Failed to build scene {name}:\n{proc.stderr}")
+
+    results = []
+    for op in args.operators:
+        result_path = os.path.join(args.cache_dir, f"{name}_{op}.json")
+        if os.path.exists(result_path):
+            os.remove(result_path)
+        try:
+            proc = blender([scene_path, "--python", __file__, "--", "--run", op, "--result", result_path],
+                           args.blender, args.timeout)
+            with open(result_path) as f:
+                result = json.load(f)
+        except (subprocess.TimeoutExpired, OSError) as e:
+            result = {"operator": op, "ok": False, "error": f"{type(e).__name__}: {e}"}
+        result.update(scenario=name, spec=spec)
+        results.append(result)
+        print(f"[{name}] {op}: " + (f"{result['wall_s']:.3f}s" if result["ok"] else result["error"]))
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print wall time against the baseline and return the regressions"""
+    base = {(r["scenario"], r["operator"]): r for r in baseline if r.get("ok")}
+    regressions = []
+    print(f"\n{'scenario':<10} {'operator':<34} {'base':>9} {'now':>9} {'ratio':>7}")
+    for r in results:
+        b = base.get((r["scenario"], r["operator"]))
+        if not (b and r.get("ok")):
+            continue
+        ratio = r["wall_s"] / b["wall_s"] if b["wall_s"] else float("inf")
+        flag = " !" if ratio > 1 + threshold else ""
+        print(f"{r['scenario']:<10} {r['operator']:<34} {b['wall_s']:>8.3f}s {r['wall_s']:>8.3f}s {ratio:>6.2f}x{flag}")
+        if flag:
+            regressions.append(r)
+    return regressions
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--blender", default=os.environ.get("BLENDER", "blender"))
+    parser.add_argument("--preset", nargs="*", choices=PRESETS, default=[])
+    parser.add_argument("--vertices", type=int)
+    parser.add_argument("--bones", type=int)
+    parser.add_argument("--shape-keys", type=int)
+    parser.add_argument("--driver-depth", type=int)
+    parser.add_argument("--frames", type=int, default=24, help="Play range for Scrubby")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--operators", nargs="*", choices=OPERATORS, default=OPERATORS)
+    parser.add_argument("--cache-dir", default=os.path.join(REPO_DIR, ".bench_cache"))
+    parser.add_argument("--timeout", type=float, default=3600)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="Results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Slowdown ratio flagged as a regression")
+    args = parser.parse_args(argv)
+
+    scenarios = {name: dict(PRESETS[name]) for name in args.preset}
+    custom = dict(vertices=args.vertices, bones=args.bones,
+                  shape_keys=args.shape_keys, driver_depth=args.driver_depth)
+    if any(v is not None for v in custom.values()):
+        defaults = PRESETS["small"]
+        scenarios["custom"] = {k: defaults[k] if v is None else v for k, v in custom.items()}
+    if not scenarios:
+        scenarios["small"] = dict(PRESETS["small"])
+    for spec in scenarios.values():
+        spec.update(frames=args.frames, seed=args.seed)
+
+    os.makedirs(args.cache_dir, exist_ok=True)
+    results = []
+    for name, spec in scenarios.items():
+        results += run_scenario(name, spec, args)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        import bpy
+    except ImportError:
+        sys.exit(main(sys.argv[1:]))
+    else:
+        blender_main(sys.argv[sys.argv.index("--") + 1:])